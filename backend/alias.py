@@ -0,0 +1,63 @@
+# backend/alias.py
+import re
+from typing import Callable
+
+
+def _trie_pattern(words) -> str:
+    """
+    Regex ad albero (prefissi condivisi) per un insieme di parole: il costo del
+    match dipende dalla lunghezza del testo, non dal numero di parole.
+    I quantificatori greedy provano prima la chiave più lunga.
+    """
+    trie: dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class AliasEngine:
+    """
+    Riscrive alias/soprannomi nella forma canonica in un solo passaggio,
+    vince il match più lungo. Le forme canoniche mappano su se stesse, così
+    "real madrid" non diventa "real madrid madrid" per via dell'alias "real".
+    """
+
+    def __init__(self, aliases: dict[str, str], stopwords=(),
+                 normalize: Callable[[str], str] | None = None):
+        norm = normalize or (lambda s: s)
+        self.stopwords = frozenset(norm(w) for w in stopwords) | frozenset(stopwords)
+        table: dict[str, str] = {}
+        for canonical in aliases.values():
+            c = norm(canonical)
+            table[c] = c
+        for alias, canonical in aliases.items():
+            a = norm(alias)
+            if a:
+                table[a] = norm(canonical)
+        self.table = table
+        self.pattern = re.compile(rf"(?<!\w){_trie_pattern(table)}(?!\w)") if table else None
+
+    def rewrite(self, text: str) -> str:
+        if not text or self.pattern is None:
+            return text
+        table = self.table
+        return self.pattern.sub(lambda m: table[m.group(0)], text)
+
+    def tokens(self, text: str) -> list[str]:
+        return [t for t in text.split() if t and t not in self.stopwords]
+
+    def __len__(self):
+        return len(self.table)
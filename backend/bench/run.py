@@ -0,0 +1,243 @@
+# backend/bench/run.py
+"""
+Benchmark offline di parser e ranking sulle pagine registrate in bench/fixtures.
+
+    cd backend
+    python -m bench.run                     # tutte le fasi
+    python -m bench.run --stage ranking     # una sola fase
+    python -m bench.run --check             # exit 1 se una fase supera bench/thresholds.json
+    python -m bench.run --parity            # risultati del backend FTS5 vs indice Python
+
+End-to-end contro un'istanza avviata sullo stub (vedi bench/stub_server.py):
+
+    python -m bench.run --e2e http://127.0.0.1:5000 --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+from bench.stub_server import load_fixture
+from parsers import (BlockCache, bitrate_to_quality, parse_livetv_event, parse_livetv_listing,
+                     parse_platin_events, parse_platin_table)
+from fts import FtsEventIndex, fts5_trigram_available
+from search import EventIndex, search_events_pipeline
+
+THRESHOLDS = Path(__file__).resolve().parent / "thresholds.json"
+
+QUERIES = ["real madrid", "juve", "premier league", "formula 1", "man utd", "atletico",
+           "nba", "chelsea arsenal", "barca", "zzzz", "champions league", "inter milan"]
+BITRATES = ["1500kbps", "3000 kbps", "6000", "8000kbps", "12000kbps", "16000kbps", None, "n/a"]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def measure(fn, iterations: int, warmup: int = 2) -> dict:
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    for i in range(iterations):
+        t = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+    total = sum(samples)
+    return {
+        "n": iterations,
+        "ops_s": iterations / total if total else float("inf"),
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+
+def churn(html: str, rows: int, seed: int = 1) -> str:
+    """Stessa pagina con `rows` titoli modificati, per misurare i refresh incrementali."""
+    parts = html.split("</a>")
+    rng = random.Random(seed)
+    for i in rng.sample(range(len(parts) - 1), min(rows, len(parts) - 1)):
+        parts[i] += " *"
+    return "</a>".join(parts)
+
+
+def build_stages() -> dict:
+    allupcoming = load_fixture("livetv_allupcoming.html")
+    event = load_fixture("livetv_event.html")
+    daily = load_fixture("platinsport_daily.html")
+    table = load_fixture("platinsport_table.html")
+    livetv_events = parse_livetv_listing(allupcoming)
+    index = EventIndex(livetv_events)
+    # le fasi FTS solo se SQLite ha FTS5 con il tokenizer trigram (come make_indexer)
+    fts_index = FtsEventIndex(livetv_events) if fts5_trigram_available() else None
+
+    # refresh incrementali: si alterna fra la pagina e una copia con l'1% delle righe cambiate
+    pages = [allupcoming, churn(allupcoming, len(livetv_events) // 100)]
+    blocks = BlockCache(verify_every=0)  # senza i confronti periodici col parse completo
+    refreshed = [parse_livetv_listing(page, cache=blocks) for page in pages]
+    indexes = [EventIndex(refreshed[0])]
+
+    def index_refresh(i):
+        indexes[0] = EventIndex(refreshed[i % 2], previous=indexes[0])
+
+    stages = {
+        "livetv_listing_parse": (lambda i: parse_livetv_listing(allupcoming), 10),
+        "livetv_listing_refresh": (lambda i: parse_livetv_listing(pages[i % 2], cache=blocks), 20),
+        "livetv_event_parse": (lambda i: parse_livetv_event(event), 200),
+        "platin_events_parse": (lambda i: parse_platin_events(daily), 30),
+        "platin_table_parse": (lambda i: parse_platin_table(table), 100),
+        "index_build": (lambda i: EventIndex(livetv_events), 10),
+        "index_refresh": (index_refresh, 20),
+        "ranking": (lambda i: search_events_pipeline(index, QUERIES[i % len(QUERIES)]), 100),
+        "bitrate_to_quality": (lambda i: [bitrate_to_quality(b) for b in BITRATES], 2000),
+    }
+    if fts_index is None:
+        print("FTS5/trigram non disponibile: salto index_build_fts e ranking_fts", file=sys.stderr)
+    else:
+        stages["index_build_fts"] = (lambda i: FtsEventIndex(livetv_events), 10)
+        stages["ranking_fts"] = (lambda i: search_events_pipeline(fts_index, QUERIES[i % len(QUERIES)]), 100)
+    return stages
+
+
+def run_stages(selected: list[str] | None, scale: float) -> dict:
+    stages = build_stages()
+    results = {}
+    for name, (fn, iterations) in stages.items():
+        if selected and name not in selected:
+            continue
+        results[name] = measure(fn, max(1, int(iterations * scale)))
+    return results
+
+
+def parity_queries(events: list[dict], n: int, seed: int = 1) -> list[str]:
+    """QUERIES più query casuali dalle parole dei titoli, con un refuso in ~40% dei casi."""
+    rng = random.Random(seed)
+    words = [w for ev in events for w in f"{ev.get('title', '')} {ev.get('competition', '')}".split()]
+    queries = list(QUERIES)
+    for _ in range(n):
+        q = " ".join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+        if rng.random() < 0.4:
+            i = rng.randrange(len(q))
+            q = q[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + q[i + 1:]
+        queries.append(q)
+    return queries
+
+
+def run_parity(n: int) -> dict:
+    """Quante query danno risultati diversi tra backend FTS5 e indice Python."""
+    if not fts5_trigram_available():
+        print("FTS5/trigram non disponibile: parity saltata", file=sys.stderr)
+        return {}
+    events = parse_livetv_listing(load_fixture("livetv_allupcoming.html")) + \
+        parse_platin_events(load_fixture("platinsport_daily.html"))
+    python_index, fts_index = EventIndex(events), FtsEventIndex(events)
+    queries = parity_queries(events, n)
+    mismatches = [q for q in queries
+                  if search_events_pipeline(python_index, q) != search_events_pipeline(fts_index, q)]
+    for q in mismatches[:10]:
+        print(f"diverso: {q!r}", file=sys.stderr)
+    return {"parity_fts": {"n": len(queries), "mismatches": len(mismatches),
+                           "mismatch_pct": 100 * len(mismatches) / len(queries)}}
+
+
+async def run_e2e(url: str, total: int, concurrency: int, tz: str) -> dict:
+    import aiohttp
+
+    sem = asyncio.Semaphore(concurrency)
+    samples: list[float] = []
+    errors = 0
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as http:
+        async def one(i: int):
+            nonlocal errors
+            async with sem:
+                t = time.perf_counter()
+                try:
+                    async with http.get(f"{url.rstrip('/')}/acestream",
+                                        params={"term": QUERIES[i % len(QUERIES)]},
+                                        headers={"Time-Zone": tz}) as r:
+                        await r.read()
+                        if r.status != 200:
+                            errors += 1
+                except aiohttp.ClientError:
+                    errors += 1
+                samples.append(time.perf_counter() - t)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    samples.sort()
+    return {"e2e_acestream": {
+        "n": total,
+        "ops_s": total / elapsed if elapsed else float("inf"),
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "errors": errors,
+    }}
+
+
+def print_table(results: dict):
+    print(f"{'fase':<24}{'n':>7}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<24}{r['n']:>7}{r['ops_s']:>12.1f}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+
+
+def check(results: dict, thresholds: dict) -> list[str]:
+    failures = []
+    for name, r in results.items():
+        limits = thresholds.get(name, {})
+        for metric, limit in limits.items():
+            if metric in r and r[metric] > limit:
+                failures.append(f"{name}: {metric} {r[metric]:.3f} > {limit}")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark di parser e ranking")
+    parser.add_argument("--stage", action="append", help="esegue solo la fase indicata (ripetibile)")
+    parser.add_argument("--scale", type=float, default=1.0, help="moltiplicatore delle iterazioni")
+    parser.add_argument("--check", action="store_true", help="fallisce se si superano le soglie")
+    parser.add_argument("--thresholds", type=Path, default=THRESHOLDS)
+    parser.add_argument("--json", type=Path, help="salva i risultati in JSON")
+    parser.add_argument("--e2e", metavar="URL", help="carica /acestream di un'istanza in esecuzione")
+    parser.add_argument("--parity", type=int, nargs="?", const=2000, metavar="N",
+                        help="confronta FTS5 e indice Python su N query casuali (default 2000)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--tz", default="Europe/Rome")
+    args = parser.parse_args(argv)
+
+    if args.e2e:
+        results = asyncio.run(run_e2e(args.e2e, args.requests, args.concurrency, args.tz))
+        print_table(results)
+    elif args.parity:
+        results = run_parity(args.parity)
+        if results:
+            r = results["parity_fts"]
+            print(f"parity_fts: {r['mismatches']}/{r['n']} query diverse ({r['mismatch_pct']:.2f}%)")
+    else:
+        results = run_stages(args.stage, args.scale)
+        print_table(results)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    if args.check:
+        failures = check(results, json.loads(args.thresholds.read_text()))
+        for f in failures:
+            print(f"REGRESSIONE {f}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
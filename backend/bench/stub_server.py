@@ -0,0 +1,194 @@
+# backend/bench/stub_server.py
+"""
+Server HTTP locale che serve le pagine registrate in bench/fixtures al posto
+di LiveTV e PlatinSport, con latenza configurabile.
+
+    python -m bench.stub_server --port 8765 --latency 0.08 --down 868
+
+Per far girare l'app contro lo stub:
+
+    LIVETV_BASE_URL=http://127.0.0.1:8765/livetv LIVETV_DOMAIN_SUFFIX= \\
+    PLATINSPORT_URL=http://127.0.0.1:8765/platinsport/ python main.py
+
+Rotte:
+    /livetv<N>/                     probe del mirror
+    /livetv<N>/enx/allupcoming/     palinsesto LiveTV
+    /livetv<N>/enx/eventinfo/...    pagina evento (ETag + 304)
+    /platinsport/                   home con il bottone ACESTREAM
+    /platinsport/link/...           pagina giornaliera
+    /ace/getstream?id=<cid>         engine AceStream finto (API JSON: stat e stop)
+
+Per il prober dei link: ACESTREAM_ENGINE_URL=http://127.0.0.1:8765. I peer
+dipendono dal CID (deterministici); circa un CID su otto risulta morto.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+_MIRROR = re.compile(r"^/livetv(\d+)(/.*)$")
+_ACE = re.compile(r"^/ace/(stat|cmd)/([0-9a-fA-F]+)$")
+
+
+def stub_peers(cid: str) -> int:
+    """Peer finti di un CID: 0 (morto) per circa un CID su otto."""
+    return int(hashlib.sha1(cid.lower().encode()).hexdigest()[:4], 16) % 8 * 5
+
+
+def load_fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+class StubConfig:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 detail_latency: float | None = None, down: set[int] | None = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.detail_latency = latency if detail_latency is None else detail_latency
+        self.down = down or set()
+        self.hits: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def delay(self, detail: bool = False):
+        base = self.detail_latency if detail else self.latency
+        wait = base + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if wait > 0:
+            time.sleep(wait)
+
+    def hit(self, route: str):
+        with self._lock:
+            self.hits[route] = self.hits.get(route, 0) + 1
+
+
+def make_handler(config: StubConfig, pages: dict[str, str]):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):  # silenzioso durante i benchmark
+            pass
+
+        def _send(self, status: int, body: str = "", headers: dict | None = None):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            if data:
+                self.wfile.write(data)
+
+        def _json(self, payload: dict):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _ace(self, path: str, query: str):
+            params = dict(p.partition("=")[::2] for p in query.split("&") if p)
+            if path == "/ace/getstream":
+                config.hit("ace_getstream")
+                cid = params.get("id", "")
+                if not re.fullmatch(r"[0-9a-fA-F]{40}", cid):
+                    return self._json({"response": None, "error": "invalid content id"})
+                base = f"http://{self.headers.get('Host')}/ace"
+                return self._json({"response": {"stat_url": f"{base}/stat/{cid}",
+                                                "command_url": f"{base}/cmd/{cid}"}, "error": None})
+            m = _ACE.match(path)
+            if m and m.group(1) == "stat":
+                config.hit("ace_stat")
+                peers = stub_peers(m.group(2))
+                return self._json({"response": {"status": "dl" if peers else "prebuf", "peers": peers},
+                                   "error": None})
+            if m:
+                config.hit("ace_stop")
+                return self._json({"response": "ok", "error": None})
+            return self._send(404, "not found")
+
+        def do_GET(self):
+            path, _, query = self.path.partition("?")
+            if path.startswith("/ace/"):
+                return self._ace(path, query)
+            m = _MIRROR.match(path)
+            if m:
+                number, rest = int(m.group(1)), m.group(2)
+                if number in config.down:
+                    config.delay()
+                    return self._send(503, "mirror down")
+                if rest.startswith("/enx/allupcoming"):
+                    config.hit("livetv_allupcoming")
+                    config.delay()
+                    return self._send(200, pages["livetv_allupcoming"])
+                if rest.startswith("/enx/eventinfo/"):
+                    config.hit("livetv_event")
+                    config.delay(detail=True)
+                    body = pages["livetv_event"]
+                    etag = '"' + hashlib.sha1(body.encode()).hexdigest()[:16] + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        return self._send(304, headers={"ETag": etag})
+                    return self._send(200, body, {"ETag": etag})
+                config.hit("livetv_probe")
+                return self._send(200, "ok")
+
+            if path.startswith("/platinsport/link/"):
+                config.hit("platinsport_daily")
+                config.delay()
+                return self._send(200, pages["platinsport_daily"])
+            if path.rstrip("/") == "/platinsport":
+                config.hit("platinsport_home")
+                config.delay()
+                return self._send(200, pages["platinsport_home"])
+
+            self._send(404, "not found")
+
+    return Handler
+
+
+def start_stub_server(port: int = 0, config: StubConfig | None = None):
+    """Avvia lo stub in un thread; ritorna (server, base_url). `port=0` sceglie una porta libera."""
+    config = config or StubConfig()
+    pages = {
+        "livetv_allupcoming": load_fixture("livetv_allupcoming.html"),
+        "livetv_event": load_fixture("livetv_event.html"),
+        "platinsport_daily": load_fixture("platinsport_daily.html"),
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config, pages))
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    # il bottone della home punta alla pagina giornaliera dello stub
+    pages["platinsport_home"] = re.sub(r'href="[^"]*"', f'href="{base_url}/platinsport/link/daily.php"',
+                                       load_fixture("platinsport_home.html"))
+    server.config = config
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub HTTP di LiveTV/PlatinSport per i benchmark")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="latenza (s) per le pagine palinsesto")
+    parser.add_argument("--detail-latency", type=float, default=None, help="latenza (s) per le pagine evento")
+    parser.add_argument("--jitter", type=float, default=0.0, help="jitter uniforme aggiuntivo (s)")
+    parser.add_argument("--down", type=int, nargs="*", default=[], help="numeri di mirror LiveTV da dare giù")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.jitter, args.detail_latency, set(args.down))
+    server, base_url = start_stub_server(args.port, config)
+    print(f"Stub in ascolto su {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# backend/breaker.py
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from engine import UpstreamError
+
+# errori consecutivi prima di aprire il circuito, e per quanto resta aperto (s)
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+# timeout adattivo: percentile osservato × fattore, entro [min, max]
+ADAPTIVE_TIMEOUT_PERCENTILE = float(os.getenv("ADAPTIVE_TIMEOUT_PERCENTILE", "0.95"))
+ADAPTIVE_TIMEOUT_FACTOR = float(os.getenv("ADAPTIVE_TIMEOUT_FACTOR", "2.0"))
+ADAPTIVE_TIMEOUT_MIN = float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "0.3"))
+ADAPTIVE_TIMEOUT_MAX = float(os.getenv("ADAPTIVE_TIMEOUT_MAX", "5.0"))
+# campioni minimi prima di fidarsi del percentile
+ADAPTIVE_MIN_SAMPLES = int(os.getenv("ADAPTIVE_MIN_SAMPLES", "20"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(UpstreamError):
+    """Host noto come giù: la richiesta non viene nemmeno tentata."""
+
+
+@dataclass
+class HostState:
+    state: str = CLOSED
+    failures: int = 0
+    opened_at: float = 0.0
+    probe_started: float | None = None
+    # latenze per tipo di richiesta: listing, pagina evento e probe hanno tempi diversi
+    latencies: dict[str, deque] = field(default_factory=dict)
+
+
+class RetryPolicy:
+    """
+    Stato per host: circuit breaker (closed → open dopo `failures` errori
+    consecutivi → half_open dopo `open_seconds`, con una sola richiesta di prova)
+    e latenze recenti per timeout adattivi e backoff con jitter.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, open_seconds: float = BREAKER_OPEN_SECONDS):
+        self.failures = failures
+        self.open_seconds = open_seconds
+        self._hosts: dict[str, HostState] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host: str) -> HostState:
+        h = self._hosts.get(host)
+        if h is None:
+            h = self._hosts[host] = HostState()
+        return h
+
+    # ---------- circuit breaker ----------
+
+    def allow(self, host: str) -> bool:
+        """False se il circuito è aperto; in half_open passa una sola prova alla volta."""
+        now = time.time()
+        with self._lock:
+            h = self._host(host)
+            if h.state == CLOSED:
+                return True
+            if h.state == OPEN:
+                if now - h.opened_at < self.open_seconds:
+                    return False
+                h.state = HALF_OPEN
+                h.probe_started = None
+            # half_open: una prova; se resta appesa oltre open_seconds ne lascio partire un'altra
+            if h.probe_started is None or now - h.probe_started >= self.open_seconds:
+                h.probe_started = now
+                return True
+            return False
+
+    def record_success(self, host: str, latency: float, kind: str = ""):
+        with self._lock:
+            h = self._host(host)
+            h.state = CLOSED
+            h.failures = 0
+            h.probe_started = None
+            samples = h.latencies.get(kind)
+            if samples is None:
+                samples = h.latencies[kind] = deque(maxlen=200)
+            samples.append(latency)
+
+    def record_failure(self, host: str):
+        with self._lock:
+            h = self._host(host)
+            h.failures += 1
+            if h.state == HALF_OPEN or h.failures >= self.failures:
+                h.state = OPEN
+                h.opened_at = time.time()
+                h.probe_started = None
+
+    def state(self, host: str) -> str:
+        with self._lock:
+            h = self._hosts.get(host)
+            return h.state if h is not None else CLOSED
+
+    # ---------- timeout e backoff ----------
+
+    def timeout(self, host: str, attempt: int, fallback: float, kind: str = "") -> float:
+        """
+        Timeout del tentativo `attempt` (0-based): percentile delle latenze
+        osservate per lo stesso host e tipo di richiesta × fattore, raddoppiato
+        a ogni tentativo; `fallback` finché non ci sono abbastanza campioni.
+        """
+        with self._lock:
+            h = self._hosts.get(host)
+            samples = sorted(h.latencies.get(kind, ())) if h is not None else []
+        if len(samples) < ADAPTIVE_MIN_SAMPLES:
+            return fallback
+        k = min(len(samples) - 1, int(ADAPTIVE_TIMEOUT_PERCENTILE * len(samples)))
+        base = samples[k] * ADAPTIVE_TIMEOUT_FACTOR * (2 ** attempt)
+        return min(ADAPTIVE_TIMEOUT_MAX, max(ADAPTIVE_TIMEOUT_MIN, base))
+
+    @staticmethod
+    def backoff(attempt: int, delay: float) -> float:
+        """Backoff esponenziale con jitter: metà fissa, metà casuale."""
+        base = delay * (2 ** attempt)
+        return base / 2 + random.uniform(0, base / 2)
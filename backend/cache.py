@@ -0,0 +1,123 @@
+# backend/cache.py
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+    expires_at: float
+    # validatori HTTP per la revalidation condizionale
+    etag: str | None = None
+    last_modified: str | None = None
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class TTLCache:
+    """
+    Cache LRU limitata a `maxsize` voci con scadenza `ttl`.
+    Le voci scadute restano finché l'LRU non le espelle, così si possono
+    rivalidare (304) invece di riscaricarle.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Valore se presente e non scaduto, altrimenti None."""
+        entry = self.peek(key)
+        return entry.value if entry is not None and entry.fresh else None
+
+    def peek(self, key: str) -> CacheEntry | None:
+        """Voce anche se scaduta (per la revalidation)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value, ttl: float | None = None,
+            etag: str | None = None, last_modified: str | None = None,
+            stored_at: float | None = None) -> CacheEntry:
+        """`stored_at` permette di ricaricare voci salvate mantenendo la loro età."""
+        now = time.time() if stored_at is None else stored_at
+        entry = CacheEntry(value=value, stored_at=now, expires_at=now + (ttl or self.ttl),
+                           etag=etag, last_modified=last_modified)
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return entry
+
+    def touch(self, key: str, ttl: float | None = None) -> CacheEntry | None:
+        """Rinnova la scadenza (es. dopo un 304 Not Modified)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                entry.expires_at = time.time() + (ttl or self.ttl)
+                self._data.move_to_end(key)
+            return entry
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def invalidate_where(self, predicate) -> int:
+        """Toglie le voci il cui valore soddisfa `predicate`; ritorna quante."""
+        with self._lock:
+            keys = [k for k, entry in self._data.items() if predicate(entry.value)]
+            for k in keys:
+                del self._data[k]
+        return len(keys)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+class StaleWhileRevalidateCache(TTLCache):
+    """
+    TTLCache che distingue voci fresche (< ttl) e stale (< stale_ttl dalla
+    scrittura): le stale si servono subito mentre il chiamante aggiorna in background.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 30.0, stale_ttl: float = 300.0):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.stale_ttl = max(stale_ttl, ttl)
+
+    def lookup(self, key: str):
+        """(valore, "fresh" | "stale") oppure (None, None) se assente o troppo vecchio."""
+        entry = self.peek(key)
+        if entry is None:
+            return None, None
+        if entry.fresh:
+            return entry.value, "fresh"
+        if time.time() < entry.stored_at + self.stale_ttl:
+            return entry.value, "stale"
+        self.invalidate(key)
+        return None, None
@@ -1,10 +1,11 @@
 # backend/db.py
+import json
 import logging
 import os
 from contextlib import contextmanager
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import create_engine, String, DateTime, ForeignKey, func
+from sqlalchemy import create_engine, delete, insert, select, String, DateTime, Float, ForeignKey, Index, Integer, Text, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
 
 DATA_DIR = os.getenv("DATA_DIR", "/usr/src/data")  # in Docker; in locale puoi sovrascrivere con env
@@ -57,6 +58,38 @@ class DeviceUser(Base):
     user_id: Mapped[str] = mapped_column(ForeignKey("users.id"), primary_key=True)
 
 
+# ---------- Snapshot persistenti (warm start dopo un riavvio) ----------
+
+class ScheduleSnapshot(Base):
+    __tablename__ = "schedule_snapshots"
+    source: Mapped[str] = mapped_column(String, primary_key=True)
+    fetched_at: Mapped[float] = mapped_column(Float, nullable=False)  # epoch, come Snapshot.fetched_at
+    meta: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
+
+
+class ScheduleEvent(Base):
+    __tablename__ = "schedule_events"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    source: Mapped[str] = mapped_column(String, nullable=False)
+    position: Mapped[int] = mapped_column(Integer, nullable=False)
+    start_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # UTC naive
+    data: Mapped[str] = mapped_column(Text, nullable=False)  # evento JSON senza _start
+
+    __table_args__ = (
+        Index("ix_schedule_events_source_position", "source", "position"),
+        Index("ix_schedule_events_start_at", "start_at"),
+    )
+
+
+class DetailLinks(Base):
+    __tablename__ = "detail_links"
+    path: Mapped[str] = mapped_column(String, primary_key=True)
+    links: Mapped[str] = mapped_column(Text, nullable=False)
+    etag: Mapped[str | None] = mapped_column(String, nullable=True)
+    last_modified: Mapped[str | None] = mapped_column(String, nullable=True)
+    fetched_at: Mapped[float] = mapped_column(Float, nullable=False, index=True)
+
+
 def init_db():
     Base.metadata.create_all(engine)
     if DATABASE_URL.startswith("sqlite"):
@@ -154,3 +187,59 @@ def unlink_user_device(session, user_id: str, device_id: str) -> bool:
         return False
     session.delete(du)
     return True
+
+
+# ---------- Helpers snapshot ----------
+
+def save_schedule(session, source: str, events: list[dict], meta: dict, fetched_at: float):
+    """Sostituisce il palinsesto salvato della sorgente (un INSERT multiplo)."""
+    session.execute(delete(ScheduleEvent).where(ScheduleEvent.source == source))
+    rows = []
+    for i, ev in enumerate(events):
+        start = ev.get("_start")
+        rows.append({
+            "source": source,
+            "position": i,
+            "start_at": start.astimezone(timezone.utc).replace(tzinfo=None) if start else None,
+            "data": json.dumps({k: v for k, v in ev.items() if k != "_start"}, ensure_ascii=False),
+        })
+    if rows:
+        session.execute(insert(ScheduleEvent), rows)
+    session.merge(ScheduleSnapshot(source=source, fetched_at=fetched_at, meta=json.dumps(meta)))
+
+
+def load_schedule(session, source: str, max_age: float | None = None):
+    """(eventi, meta, fetched_at) dell'ultimo palinsesto salvato, o None se assente/troppo vecchio."""
+    snap = session.get(ScheduleSnapshot, source)
+    if snap is None:
+        return None
+    if max_age is not None and snap.fetched_at < datetime.now(timezone.utc).timestamp() - max_age:
+        return None
+    events = []
+    rows = session.execute(
+        select(ScheduleEvent.start_at, ScheduleEvent.data)
+        .where(ScheduleEvent.source == source)
+        .order_by(ScheduleEvent.position)
+    ).all()
+    for start_at, data in rows:
+        ev = json.loads(data)
+        if start_at is not None:
+            ev["_start"] = start_at.replace(tzinfo=timezone.utc)
+        events.append(ev)
+    return events, json.loads(snap.meta), snap.fetched_at
+
+
+def save_detail_links(session, path: str, links: list[dict], etag: str | None,
+                      last_modified: str | None, fetched_at: float):
+    session.merge(DetailLinks(path=path, links=json.dumps(links, ensure_ascii=False), etag=etag,
+                              last_modified=last_modified, fetched_at=fetched_at))
+
+
+def load_detail_links(session, max_age: float) -> list[tuple[str, list[dict], str | None, str | None, float]]:
+    """Pagine evento salvate negli ultimi `max_age` secondi (le più vecchie vengono cancellate)."""
+    since = datetime.now(timezone.utc).timestamp() - max_age
+    session.execute(delete(DetailLinks).where(DetailLinks.fetched_at < since))
+    rows = session.execute(
+        select(DetailLinks).where(DetailLinks.fetched_at >= since).order_by(DetailLinks.fetched_at)
+    ).scalars().all()
+    return [(r.path, json.loads(r.links), r.etag, r.last_modified, r.fetched_at) for r in rows]
@@ -0,0 +1,181 @@
+# backend/engine.py
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import aiohttp
+from multidict import CIMultiDict
+
+# connessioni upstream condivise da tutte le ricerche
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+# tetto di default per host (0 = nessuno) e override puntuali "host=n,host=n"
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "20"))
+HTTP_HOST_LIMITS = os.getenv("HTTP_HOST_LIMITS", "")
+# connessioni inattive tenute aperte (s): oltre il refresh degli snapshot, così restano calde
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "90"))
+# cache delle risoluzioni DNS (s)
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "300"))
+# connessioni aperte per host all'avvio (0 = nessun warm-up)
+HTTP_WARMUP_CONNECTIONS = int(os.getenv("HTTP_WARMUP_CONNECTIONS", "3"))
+# thread per ranking e parsing (asyncio.to_thread): il default di asyncio è min(32, cpu + 4)
+SCRAPE_EXECUTOR_WORKERS = int(os.getenv("SCRAPE_EXECUTOR_WORKERS", "64"))
+HTTP_USER_AGENT = os.getenv("HTTP_USER_AGENT", "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36")
+
+
+class UpstreamError(Exception):
+    """Richiesta upstream fallita (rete, timeout o status >= 400)."""
+
+
+class UpstreamTimeout(UpstreamError):
+    """La richiesta upstream ha superato il timeout."""
+
+
+class UpstreamStatusError(UpstreamError):
+    """L'host ha risposto con uno status >= 400."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def client_error(self) -> bool:
+        """4xx: l'host è vivo, è la risorsa a non andare (es. pagina evento rimossa)."""
+        return 400 <= self.status_code < 500
+
+
+@dataclass
+class Response:
+    url: str
+    status_code: int
+    text: str
+    # case-insensitive come in aiohttp: il server può mandare "Etag" invece di "ETag"
+    headers: CIMultiDict = field(default_factory=CIMultiDict)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise UpstreamStatusError(f"{self.status_code} per {self.url}", self.status_code)
+
+
+def parse_host_limits(spec: str) -> dict[str, int]:
+    """"livetv869.me=8, www.platinsport.com=4" -> {host: limite}; voci malformate ignorate."""
+    limits = {}
+    for item in spec.split(","):
+        host, sep, value = item.strip().partition("=")
+        if sep and host.strip() and value.strip().isdigit():
+            limits[host.strip().lower()] = int(value)
+    return limits
+
+
+class AsyncEngine:
+    """
+    Event loop asyncio su un thread dedicato con un client HTTP condiviso.
+    I thread di Flask/gunicorn gli passano le coroutine di scraping e attendono
+    il risultato: molte ricerche condividono un solo loop e un solo pool di connessioni.
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, per_host: int = HTTP_POOL_PER_HOST,
+                 host_limits: dict[str, int] | None = None, keepalive: float = HTTP_KEEPALIVE,
+                 dns_ttl: int = HTTP_DNS_TTL, executor_workers: int = SCRAPE_EXECUTOR_WORKERS):
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.host_limits = parse_host_limits(HTTP_HOST_LIMITS) if host_limits is None else host_limits
+        self.keepalive = keepalive
+        self.dns_ttl = dns_ttl
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(ThreadPoolExecutor(executor_workers, thread_name_prefix="scrape-cpu"))
+        self._http: aiohttp.ClientSession | None = None
+        # semafori per gli host con un limite dedicato (creati e usati solo sul loop)
+        self._host_slots: dict[str, asyncio.Semaphore] = {}
+        self._thread = threading.Thread(target=self._run_loop, name="scrape-loop", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Programma la coroutine sul loop; ritorna un concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float | None = None):
+        """Esegue la coroutine sul loop e attende il risultato (da un thread qualsiasi tranne il loop)."""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    async def http(self) -> aiohttp.ClientSession:
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size,
+                                               limit_per_host=self.per_host,
+                                               keepalive_timeout=self.keepalive,
+                                               use_dns_cache=True,
+                                               ttl_dns_cache=self.dns_ttl),
+                headers={"User-Agent": HTTP_USER_AGENT},
+            )
+        return self._http
+
+    def _slot(self, url: str) -> asyncio.Semaphore | None:
+        host = (urlsplit(url).hostname or "").lower()
+        limit = self.host_limits.get(host)
+        if not limit:
+            return None
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(limit)
+        return slot
+
+    async def get(self, url: str, timeout: float, headers: dict | None = None) -> Response:
+        slot = self._slot(url)
+        if slot is None:
+            return await self._get(url, timeout, headers)
+        async with slot:
+            return await self._get(url, timeout, headers)
+
+    async def _get(self, url: str, timeout: float, headers: dict | None = None) -> Response:
+        http = await self.http()
+        try:
+            async with http.get(url, headers=headers,
+                                timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+                text = await r.text(errors="replace")
+                return Response(url=str(r.url), status_code=r.status, text=text, headers=CIMultiDict(r.headers))
+        except asyncio.TimeoutError as e:
+            raise UpstreamTimeout(f"Timeout per {url}") from e
+        except aiohttp.ClientError as e:
+            raise UpstreamError(f"{type(e).__name__} per {url}: {e}") from e
+
+    async def warm_up(self, urls: list[str], connections: int = HTTP_WARMUP_CONNECTIONS,
+                      timeout: float = 5.0):
+        """
+        Apre in anticipo `connections` connessioni keep-alive verso ogni host
+        (DNS + TCP + TLS), così le prime ricerche non pagano gli handshake.
+        """
+        if connections <= 0 or not urls:
+            return
+        start_time = time.time()
+        outcomes = await asyncio.gather(*(self.get(url, timeout) for url in urls for _ in range(connections)),
+                                        return_exceptions=True)
+        failed = sum(isinstance(o, BaseException) for o in outcomes)
+        logging.info(f"[ENGINE] Warm-up di {len(urls)} host in {time.time() - start_time:.2f}s "
+                     f"({len(outcomes) - failed}/{len(outcomes)} connessioni)")
+
+    def close(self):
+        async def _close():
+            if self._http is not None:
+                await self._http.close()
+        try:
+            self.run(_close(), timeout=5)
+        except Exception as e:
+            logging.warning(f"[ENGINE] Chiusura client HTTP: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+engine = AsyncEngine()
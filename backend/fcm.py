@@ -1,5 +1,6 @@
 # backend/fcm.py
 import os, time, requests
+from requests.adapters import HTTPAdapter
 from google.oauth2 import service_account
 from google.auth.transport.requests import Request
 
@@ -7,6 +8,11 @@ FIREBASE_PROJECT_ID = os.environ.get("FIREBASE_PROJECT_ID", "acetvpair")
 SCOPES = ["https://www.googleapis.com/auth/firebase.messaging"]
 _FCM_TOKEN_CACHE = {"exp": 0, "token": None}
 
+# sessione condivisa: connessione TLS a fcm.googleapis.com riusata tra gli invii
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=4,
+                                    pool_maxsize=int(os.environ.get("FCM_POOL_SIZE", "10"))))
+
 def _get_access_token():
     now = time.time()
     if _FCM_TOKEN_CACHE["token"] and now < _FCM_TOKEN_CACHE["exp"] - 60:
@@ -14,7 +20,7 @@ def _get_access_token():
     creds = service_account.Credentials.from_service_account_file(
         os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "../service-account.json"), scopes=SCOPES
     )
-    creds.refresh(Request())
+    creds.refresh(Request(session=_http))
     _FCM_TOKEN_CACHE["token"] = creds.token
     _FCM_TOKEN_CACHE["exp"] = now + int(creds.expiry.timestamp() - now)
     return _FCM_TOKEN_CACHE["token"]
@@ -32,7 +38,7 @@ def send_to_token(token: str, data: dict):
         }
     }
     headers = {"Authorization": f"Bearer {_get_access_token()}"}
-    r = requests.post(url, json=body, headers=headers, timeout=10)
+    r = _http.post(url, json=body, headers=headers, timeout=10)
     if r.status_code >= 300:
         raise RuntimeError(f"FCM error {r.status_code}: {r.text}")
     return r.json()
@@ -0,0 +1,66 @@
+# backend/fts.py
+import logging
+import sqlite3
+import threading
+
+from search import EventIndex, np
+
+
+def fts5_trigram_available() -> bool:
+    try:
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+class FtsCandidates:
+    """
+    Candidati da una tabella FTS5 con tokenizer trigram: i testi che hanno
+    almeno un trigramma della query. Stessa interfaccia di search.CandidateIndex.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock, table: str, texts: list[str]):
+        self._conn = conn
+        self._lock = lock
+        self._table = table
+        self.size = len(texts)
+        conn.execute(f"CREATE VIRTUAL TABLE {table} USING fts5(text, tokenize='trigram')")
+        conn.executemany(f"INSERT INTO {table}(rowid, text) VALUES (?, ?)", enumerate(texts))
+
+    def candidates(self, q_clean: str, q_tokens: frozenset[str]) -> np.ndarray:
+        grams = {q_clean[i:i + 3] for i in range(len(q_clean) - 2)}
+        if not grams:
+            # query < 3 caratteri: il trigram non filtra, si valuta tutto
+            return np.arange(self.size)
+        match = " OR ".join('"' + g.replace('"', '""') + '"' for g in sorted(grams))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT rowid FROM {self._table} WHERE {self._table} MATCH ? ORDER BY rowid", (match,)
+            ).fetchall()
+        return np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+
+
+class FtsEventIndex(EventIndex):
+    """
+    EventIndex con i candidati presi da SQLite FTS5 (trigram) in memoria invece
+    che dall'indice invertito in Python; il punteggio resta quello di rapidfuzz.
+    Una connessione per snapshot, condivisa dai thread del ranking con un lock.
+    """
+
+    def _candidate_indexes(self):
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        lock = threading.Lock()
+        return (FtsCandidates(self._conn, lock, "titles", self.titles),
+                FtsCandidates(self._conn, lock, "competitions", self.competitions))
+
+
+def make_indexer(backend: str):
+    """Costruttore dell'indice per SEARCH_BACKEND: "python" (default) o "fts"."""
+    if backend == "fts":
+        if np is not None and fts5_trigram_available():
+            return FtsEventIndex
+        logging.warning("[SEARCH] FTS5/trigram o numpy non disponibili: uso l'indice Python")
+    return EventIndex
@@ -1,26 +1,66 @@
+import asyncio
+import json
 import logging
-import re
+import os
+import queue
 import time
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
-from datetime import datetime, timedelta
+from functools import lru_cache, partial
 from pathlib import Path
 from secrets import token_hex
+from urllib.parse import urlsplit
 from zoneinfo import ZoneInfo
 
-import requests
-import unicodedata
-from bs4 import BeautifulSoup
-from flask import Flask, request, send_from_directory
+from flask import Flask, Response, request, send_from_directory
 from flask import jsonify
-from rapidfuzz import fuzz
 
 from auth import sign_uid
-from db import init_db
+from breaker import CircuitOpen, RetryPolicy
+from cache import StaleWhileRevalidateCache, TTLCache
+from db import db_session, init_db, load_detail_links, load_schedule, save_detail_links, save_schedule
+import metrics
+from engine import UpstreamError, UpstreamStatusError, UpstreamTimeout, engine
+from fts import make_indexer
+from merge import content_id, merge_results
+from mirrors import MirrorManager, NoHealthyMirror
 from pair import tv_bp
-from word import SYNONYMS, STOPWORDS
+from providers import ProviderRegistry, SourceError
+from prober import LinkProber
+from parsers import (BlockCache, parse_livetv_event, parse_livetv_listing, parse_platin_daily_link,
+                     parse_platin_events)
+from search import search_events_pipeline
+from singleflight import SingleFlight
+from snapshot import SnapshotStore
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# sovrascrivibile per puntare a un server stub (vedi bench/stub_server.py)
+PLATINSPORT_URL = os.getenv("PLATINSPORT_URL", "https://www.platinsport.com/")
+
+# budget (s) per scaricare le pagine evento LiveTV di una ricerca: sotto SOURCE_TIMEOUT
+LIVETV_DETAIL_BUDGET = float(os.getenv("LIVETV_DETAIL_BUDGET", "4.0"))
+# margine (s) fra la fine del budget e il timeout della sorgente, per comporre la risposta
+LIVETV_DEADLINE_MARGIN = float(os.getenv("LIVETV_DEADLINE_MARGIN", "0.3"))
+# risultati di /acestream per termine normalizzato, orari in UTC (il fuso si applica in risposta)
+RESULT_CACHE_ERROR_TTL = float(os.getenv("RESULT_CACHE_ERROR_TTL", "10"))
+_RESULT_CACHE = StaleWhileRevalidateCache(maxsize=int(os.getenv("RESULT_CACHE_SIZE", "1024")),
+                                          ttl=float(os.getenv("RESULT_CACHE_TTL", "30")),
+                                          stale_ttl=float(os.getenv("RESULT_CACHE_STALE_TTL", "300")))
+_background_tasks: set[asyncio.Task] = set()
+# palinsesti e pagine evento anche su SQLite: dopo un riavvio si riparte da lì
+SNAPSHOT_PERSIST = os.getenv("SNAPSHOT_PERSIST", "1") == "1"
+# oltre quest'età (s) i dati salvati non si usano per il warm start
+SNAPSHOT_WARM_MAX_AGE = float(os.getenv("SNAPSHOT_WARM_MAX_AGE", "21600"))
+# selezione dei candidati per il ranking: "python" (indice invertito) o "fts" (SQLite FTS5 trigram)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "python")
+# margine (s) oltre il timeout delle sorgenti prima di chiudere uno stream
+STREAM_GRACE = float(os.getenv("STREAM_GRACE", "2.0"))
+_STREAM_DONE = object()
+# termini massimi per /acestream/batch
+BATCH_MAX_TERMS = int(os.getenv("BATCH_MAX_TERMS", "20"))
+# link delle pagine evento già parsati (cambiano raramente una volta pubblicati)
+_DETAIL_CACHE = TTLCache(maxsize=int(os.getenv("DETAIL_CACHE_SIZE", "512")),
+                         ttl=float(os.getenv("DETAIL_CACHE_TTL", "300")))
+
 # Init DB all'avvio
 init_db()
 
@@ -44,101 +84,10 @@ if not FRONTEND_DIR:
     )
 
 
-def _norm_simple(s: str) -> str:
-    return re.sub(r"\s+", " ", normalize_string((s or "").lower())).strip()
-
-
-def _apply_syn(s: str) -> str:
-    text = s
-    for k, v in SYNONYMS.items():
-        text = re.sub(rf"\b{re.escape(k)}\b", v, text)
-    return text
-
-
-def _tokens(s: str) -> list[str]:
-    return [t for t in s.split() if t and t not in STOPWORDS]
-
-
-def _gate_ok(q_clean: str, t_clean: str) -> bool:
-    """Accetta solo se c'è overlap serio: almeno un token ≥3 char in comune
-    OPPURE substring di un token query (≥4 char) nel titolo
-    OPPURE partial_ratio alto."""
-    q_tokens = [tok for tok in _tokens(q_clean) if len(tok) >= 3]
-    t_tokens = [tok for tok in _tokens(t_clean) if len(tok) >= 3]
-    if set(q_tokens) & set(t_tokens):
-        return True
-    if any(tok in t_clean for tok in q_tokens if len(tok) >= 4):
-        return True
-    if fuzz.partial_ratio(q_clean, t_clean) >= 80:
-        return True
-    return False
-
-
-def _score(q_clean: str, t_clean: str) -> float:
-    """Score semplice e robusto ai typo/riordini."""
-    s1 = fuzz.token_set_ratio(q_clean, t_clean)  # robusto a ordine/parole extra
-    s2 = fuzz.partial_ratio(q_clean, t_clean)  # robusto a sottostringhe/typo
-    # bonus se la query (pulita) è substring del titolo
-    bonus = 6 if q_clean in t_clean and len(q_clean) >= 4 else 0
-    return float(max(s1, s2) + bonus)
-
-
-def search_events_pipeline(parsed_events: list[dict],
-                           search_term: str,
-                           top_n: int = 3,
-                           strong_threshold_title: float = 90.0,
-                           min_score_desc: float = 72.0) -> list[dict]:
-    """
-    1) Titolo: se esiste uno strong match (>= strong_threshold_title) → ritorna SOLO quello.
-    2) Descrizione/Competition: se no, ritorna fino a top_n risultati sopra min_score_desc.
-    """
-    if not search_term:
-        return []
-
-    q_clean = _apply_syn(_norm_simple(search_term))
-
-    # ---------- PASS 1: TITOLO (strong -> 1 solo risultato) ----------
-    strong_hits = []
-    for idx, ev in enumerate(parsed_events):
-        title = ev.get("title") or ev.get("titolo") or ""
-        t_clean = _apply_syn(_norm_simple(title))
-        if not _gate_ok(q_clean, t_clean):
-            continue
-        s = _score(q_clean, t_clean)
-        if s >= strong_threshold_title:
-            strong_hits.append((idx, s))
-
-    if strong_hits:
-        best_idx, best_s = max(strong_hits, key=lambda x: x[1])
-        ev = parsed_events[best_idx]
-        return [{**ev, "_score": round(best_s, 2), "_match": "strong_title"}]
-
-    # ---------- PASS 2: DESCRIZIONE / COMPETITION (multi risultati) ----------
-    scored_desc = []
-    for idx, ev in enumerate(parsed_events):
-        comp = ev.get("competition") or ev.get("descrizione") or ""
-        if not comp.strip():
-            continue
-        c_clean = _apply_syn(_norm_simple(comp))
-        if not _gate_ok(q_clean, c_clean):
-            continue
-        s = _score(q_clean, c_clean)
-        if s >= min_score_desc:
-            scored_desc.append((idx, s))
-
-    scored_desc.sort(key=lambda x: x[1], reverse=True)
-    out = []
-    for idx, s in scored_desc[:top_n]:
-        ev = parsed_events[idx]
-        out.append({**ev, "_score": round(s, 2), "_match": "desc"})
-    return out
-
-
 logging.info(f"[STATIC] Uso frontend da: {FRONTEND_DIR}")
 
 app = Flask(__name__, static_folder=str(FRONTEND_DIR), static_url_path="/")
 app.register_blueprint(tv_bp)
-session = requests.Session()
 
 @app.get("/")
 def _index():
@@ -151,91 +100,237 @@ def auth_anon():
     return jsonify({"uid": uid, "sig": sign_uid(uid)})
 
 
-@app.route('/acestream', methods=['GET'])
-def acestream():
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+
+def _search_request():
+    """Valida Time-Zone e term: (termine, fuso, None) oppure (None, None, risposta di errore)."""
     logging.info(f"Ricevuta richiesta con termine di ricerca: {request.args.get('term')}")
 
     # Time-Zone obbligatorio dal FE
     tz_header = request.headers.get("Time-Zone")
     if not tz_header:
-        return jsonify({"error": "Missing Time-Zone header"}), 400
+        return None, None, (jsonify({"error": "Missing Time-Zone header"}), 400)
     target_tz = _to_zoneinfo(tz_header)
 
-    result = []
     raw_term = request.args.get('term', '')
     search_term = ' '.join(raw_term.split())
     if not search_term:
         logging.error("Parametro 'term' mancante")
-        return jsonify({"error": "Parameter 'term' is required"}), 400
-    # ================TEST====================================================#
-    replacements = {
-        "f1": "formula 1",
-    }
+        return None, None, (jsonify({"error": "Parameter 'term' is required"}), 400)
+    search_term = TERM_REPLACEMENTS.get(search_term.lower(), search_term)
+    return search_term, target_tz, None
+
 
-    search_term = replacements.get(search_term.lower(), search_term)
+@app.route('/acestream', methods=['GET'])
+def acestream():
+    search_term, target_tz, error = _search_request()
+    if error:
+        return error
+    # ================TEST====================================================#
     res = test_link(search_term)
     if res:
         return res
     # ================TEST====================================================#
 
     start_time = time.time()
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        f_ltv = executor.submit(livetv_scraper, search_term, target_tz)
-        f_ps = executor.submit(platinsport_scraper, search_term, target_tz)
+    with metrics.observe("acestream", "request"):
+        results = engine.run(search_cached(search_term))
 
-        results = []
-        try:
-            f_ltv_res = f_ltv.result(timeout=5)
-            results.append(f_ltv_res)
-        except FuturesTimeoutError:
-            f_ltv.cancel()
-            results.append({"source": "LiveTV", "error": "timeout"})
+    logging.info(f"Tempo totale per l'elaborazione della richiesta: {time.time() - start_time:.2f} secondi")
+    # ?merge=1: un solo blocco con eventi e link deduplicati tra le sorgenti
+    if _truthy(request.args.get("merge")):
+        results = merge_results(results, search_term)
+    return jsonify(localize_results(rank_links(results), search_term, target_tz))
 
-        try:
-            f_ps_res = f_ps.result(timeout=5)
-            results.append(f_ps_res)
-        except FuturesTimeoutError:
-            f_ps.cancel()
-            results.append({"source": "PlatinSport", "error": "timeout"})
 
-    logging.info(f"Tempo totale per l'elaborazione della richiesta: {time.time() - start_time:.2f} secondi")
-    return jsonify(results)
-
-
-LANG_CODE = {
-    # ID -> code
-    "1": "ru",
-    "2": "uk",
-    "3": "ua",
-    "4": "nl",
-    "5": "sa",  # "ae" se preferisci EAU
-    "6": "cn",
-    "7": "es",
-    "8": "pl",
-    "9": "br",
-    "10": "tr",
-    "11": "fr",
-    "12": "it",
-    "13": "de",
-    "14": "ro",
-
-    # name (lowercase) -> code
-    "russian": "ru",
-    "english": "uk",
-    "ukrainian": "ua",
-    "dutch": "nl",
-    "arabic": "sa",
-    "chinese": "cn",
-    "spanish": "es",
-    "polish": "pl",
-    "portuguese": "pt",
-    "turkish": "tr",
-    "french": "fr",
-    "italian": "it",
-    "german": "de",
-    "romanian": "ro",
+def _truthy(value) -> bool:
+    return str(value or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+@app.get('/acestream/stream')
+def acestream_stream():
+    """
+    Come /acestream, ma ogni sorgente viene inviata appena pronta: NDJSON
+    (una riga per sorgente) oppure SSE con `?format=sse` o Accept: text/event-stream.
+    La risposta si chiude quando tutte le sorgenti hanno finito o sono in timeout.
+    """
+    search_term, target_tz, error = _search_request()
+    if error:
+        return error
+    sse = request.args.get("format") == "sse" or "text/event-stream" in request.headers.get("Accept", "")
+
+    ready: queue.Queue = queue.Queue()
+    test = test_link(search_term)
+    if test:
+        for res in test.get_json():
+            ready.put(res)
+        ready.put(_STREAM_DONE)
+    else:
+        future = engine.submit(search_streaming(search_term, ready.put))
+        future.add_done_callback(lambda f: ready.put(_STREAM_DONE))
+
+    def generate():
+        deadline = time.time() + providers.max_timeout() + STREAM_GRACE
+        while True:
+            try:
+                res = ready.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                break
+            if res is _STREAM_DONE:
+                break
+            if "events" in res and not test:
+                res = localize_results(rank_links([res]), search_term, target_tz)[0]
+            data = json.dumps(res, ensure_ascii=False)
+            yield f"event: source\ndata: {data}\n\n" if sse else data + "\n"
+        if sse:
+            yield "event: done\ndata: {}\n\n"
+
+    return Response(generate(), mimetype="text/event-stream" if sse else "application/x-ndjson",
+                    headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"})
+
+
+@app.post('/acestream/batch')
+def acestream_batch():
+    """
+    Più termini in una richiesta: {"terms": ["juve", "milan", ...], "merge": false}. Tutti usano
+    lo stesso snapshot delle sorgenti e ogni pagina evento si scarica una sola
+    volta anche se più termini portano allo stesso evento.
+    """
+    tz_header = request.headers.get("Time-Zone")
+    if not tz_header:
+        return jsonify({"error": "Missing Time-Zone header"}), 400
+    target_tz = _to_zoneinfo(tz_header)
+
+    body = request.get_json(silent=True)
+    # anche un JSON valido che non è un oggetto (es. ["juve"]) è un body sbagliato
+    terms = body.get("terms") if isinstance(body, dict) else None
+    if not isinstance(terms, list) or not all(isinstance(t, str) for t in terms):
+        return jsonify({"error": "Body must be {\"terms\": [string, ...]}"}), 400
+    terms = [TERM_REPLACEMENTS.get(t.lower(), t) for t in (' '.join(t.split()) for t in terms) if t]
+    if not terms:
+        return jsonify({"error": "Parameter 'terms' is required"}), 400
+    if len(terms) > BATCH_MAX_TERMS:
+        return jsonify({"error": f"At most {BATCH_MAX_TERMS} terms per request"}), 400
+
+    logging.info(f"Ricevuta richiesta batch con {len(terms)} termini")
+    start_time = time.time()
+    with metrics.observe("acestream", "batch"):
+        results = engine.run(search_batch(terms))
+    logging.info(f"Batch di {len(terms)} termini elaborato in {time.time() - start_time:.2f}s")
+    if _truthy(body.get("merge")):
+        results = [merge_results(res, term) for term, res in zip(terms, results)]
+    return jsonify([{"term": term, "results": localize_results(rank_links(res), term, target_tz)}
+                    for term, res in zip(terms, results)])
+
+
+TERM_REPLACEMENTS = {
+    "f1": "formula 1",
 }
 
+
+def normalize_term(raw_term: str) -> str:
+    """Chiave di ricerca: spazi compattati, replacements applicati, minuscolo."""
+    search_term = ' '.join((raw_term or '').split())
+    return TERM_REPLACEMENTS.get(search_term.lower(), search_term).lower()
+
+
+async def search_cached(search_term: str) -> list[dict]:
+    """
+    Risultati dalla cache (indipendente dal fuso) con stale-while-revalidate:
+    voce fresca → subito; stale → subito + aggiornamento in background; assente → scraping.
+    """
+    key = normalize_term(search_term)
+    results, state = _RESULT_CACHE.lookup(key)
+    metrics.RESULT_CACHE.labels(state or "miss").inc()
+    if state == "fresh":
+        return results
+    if state == "stale":
+        if not _inflight_searches.inflight(key):
+            _spawn(_search_and_store(key))
+        return results
+    return await _search_and_store(key)
+
+
+def _spawn(coro) -> asyncio.Task:
+    """Task in background sul loop, con un riferimento finché non termina."""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def search_batch(terms: list[str]) -> list[list[dict]]:
+    """Risultati per ogni termine, nell'ordine dato; i termini equivalenti si cercano una volta."""
+    keys = {normalize_term(t): t for t in terms}
+    found = dict(zip(keys, await asyncio.gather(*(search_cached(t) for t in keys.values()))))
+    return [found[normalize_term(t)] for t in terms]
+
+
+async def search_streaming(search_term: str, emit) -> None:
+    """
+    Come search_cached, ma passa a `emit` ogni sorgente appena completa.
+    Con la cache (o una ricerca identica già in corso) emette tutto insieme alla fine.
+    """
+    key = normalize_term(search_term)
+    cached, state = _RESULT_CACHE.lookup(key)
+    if state is None and not _inflight_searches.inflight(key):
+        metrics.RESULT_CACHE.labels("miss").inc()
+        await _inflight_searches.do(key, lambda: _scrape_and_store(key, on_result=emit))
+        return
+    for res in await search_cached(search_term):
+        emit(res)
+
+
+async def _search_and_store(key: str) -> list[dict]:
+    """Ricerche identiche concorrenti condividono un solo scraping; l'esito va in cache."""
+    return await _inflight_searches.do(key, lambda: _scrape_and_store(key))
+
+
+async def _scrape_and_store(key: str, on_result=None) -> list[dict]:
+    results = await providers.search(key, on_result)
+    # esiti con errori o parziali restano in cache per poco: la sorgente può tornare
+    degraded = any(r["error"] or r["partial"] for r in results)
+    _RESULT_CACHE.set(key, results, ttl=RESULT_CACHE_ERROR_TTL if degraded else None)
+    # verifica dei link già prima che qualcuno li chieda di nuovo
+    link_prober.schedule(_result_cids(results))
+    return results
+
+
+def _result_cids(results: list[dict]) -> list[str]:
+    return [cid for res in results for ev in res["events"]
+            for link in ev.get("acestream_links") or [] if (cid := content_id(link.get("link")))]
+
+
+def rank_links(results: list[dict]) -> list[dict]:
+    """
+    Link di ogni evento ordinati per disponibilità secondo il prober (solo cache,
+    non attende) e sonde avviate in background per i CID non ancora verificati.
+    """
+    if not link_prober.enabled:
+        return results
+    engine.loop.call_soon_threadsafe(link_prober.schedule, _result_cids(results))
+    return [{**res, "events": [{**ev, "acestream_links": link_prober.rank(ev.get("acestream_links") or [])}
+                               for ev in res["events"]]}
+            for res in results]
+
+
+def localize_results(results: list[dict], search_term: str, target_tz: ZoneInfo | None) -> list[dict]:
+    """Applica il fuso dell'utente (orario + event_title) ai risultati condivisi, senza modificarli."""
+    out = []
+    for res in results:
+        events = []
+        for ev in res["events"]:
+            loc = _localize(ev, target_tz)
+            loc["event_title"] = f"{loc['title']} | {loc['competition']} | {loc['time']}"
+            events.append(loc)
+        out.append({**res, "search_term": search_term, "events": events})
+    return out
+
+
+@lru_cache(maxsize=128)
 def _to_zoneinfo(tz_str: str):
     try:
         return ZoneInfo(tz_str)
@@ -250,87 +345,59 @@ def _s(x):  # safe str
     return (x or "").strip()
 
 
-def resolve_lang_code(title: str | None, src: str | None) -> str | None:
-    # prova dal title (nome lingua)
-    if title:
-        key = title.strip().lower()
-        code = LANG_CODE.get(key)
-        if code:
-            return code
-    # fallback: prova dall'ID nel src
-    if src:
-        m = re.search(r'/linkflag/(\d+)\.png', src)
-        if m:
-            return LANG_CODE.get(m.group(1))
-    return None
+def _request_kind(url: str, headers: dict | None) -> str:
+    """
+    Tipo di richiesta per le latenze del timeout adattivo: i primi due segmenti
+    del path (es. "/enx/allupcoming", "/enx/eventinfo"), le rivalidazioni a parte.
+    """
+    kind = "/" + "/".join(urlsplit(url).path.strip("/").split("/")[:2])
+    if headers and ("If-None-Match" in headers or "If-Modified-Since" in headers):
+        kind += " (304)"
+    return kind
 
 
-def make_request_with_retry(url, retries=2, delay=0.3, timeout=0.2):
+async def make_request_with_retry(url, retries=2, delay=0.3, timeout=0.2, headers=None, source="upstream"):
     """
-    Effettua una richiesta HTTP con sessione, retry e timeout configurabili.
+    Effettua una richiesta HTTP con il client condiviso, retry e timeout configurabili.
+    Se l'host è noto come giù (circuito aperto) fallisce subito con CircuitOpen.
+    `source` etichetta le metriche di retry e timeout.
     """
+    host = urlsplit(url).hostname or url
+    kind = _request_kind(url, headers)
     for attempt in range(retries):
-        # per ogni tentativo aumento il timeout con il delay
-        timeout = timeout + delay
+        if not retry_policy.allow(host):
+            metrics.CIRCUIT_REJECTIONS.labels(source).inc()
+            raise CircuitOpen(f"Circuito aperto per {host}")
+        # timeout dalle latenze osservate; senza storico aumento il timeout con il delay
+        attempt_timeout = retry_policy.timeout(host, attempt, fallback=timeout + delay * (attempt + 1),
+                                              kind=kind)
+        start_time = time.perf_counter()
         try:
-            response = session.get(url, timeout=timeout)
-            response.raise_for_status()
-            return response
-        except requests.exceptions.RequestException as e:
-            logging.warning(f"Tentativo {attempt + 1} fallito per {url}: {e}")
-            time.sleep(delay)
-    raise requests.exceptions.RequestException(f"Impossibile ottenere una risposta da {url} dopo {retries} tentativi")
-
-
-def normalize_string(s):
-    return unicodedata.normalize('NFKD', s).encode('ASCII', 'ignore').decode('utf-8')
-
-
-def parse_platin_table(html: str):
-    soup = BeautifulSoup(html, "html.parser")
-    items = []
-    current_league = ""
-
-    # la pagina reale ha più tabelle; qui prendiamo tutte le righe
-    for tr in soup.select("div.entry table tbody tr"):
-        # riga di intestazione lega
-        stil = tr.select_one("td.stil")
-        if stil:
-            current_league = stil.get_text(" ", strip=True)
-            continue
-
-        tds = tr.find_all("td")
-        if len(tds) < 3:
-            continue
-
-        # orario (preferisci <time>, fallback al testo del td)
-        t_time = tr.select_one("td.boy time")
-        time_txt = (t_time.get_text(strip=True) if t_time else tds[0].get_text(strip=True))
-
-        # titolo partita
-        title_txt = tds[1].get_text(" ", strip=True)
-
-        # link bottone ACESTREAM
-        a = tr.select_one("td.boy2 a[href]")
-        if not a:
-            continue
-        href = a["href"].strip()
-
-        # molti link sono del tipo bc.vc/.../https://www.platinsport.com/link/...
-        # → estrai l'ultima https://
-        if "https://" in href:
-            target = "https://" + href.split("https://")[-1]
+            response = await engine.get(url, timeout=attempt_timeout, headers=headers)
+        except UpstreamError as e:
+            retry_policy.record_failure(host)
+            error = e
         else:
-            target = href
-
-        items.append({
-            "league": current_league,
-            "time": time_txt,
-            "title": title_txt,
-            "href": target,
-        })
-
-    return items
+            # un 4xx vuol dire host vivo: conta come errore per il breaker solo il 5xx
+            if response.status_code >= 500:
+                retry_policy.record_failure(host)
+            else:
+                retry_policy.record_success(host, time.perf_counter() - start_time, kind)
+            try:
+                response.raise_for_status()
+                return response
+            except UpstreamStatusError as e:
+                # un 4xx non cambia riprovando: va subito al chiamante
+                if e.client_error:
+                    raise
+                error = e
+        logging.warning(f"Tentativo {attempt + 1} fallito per {url}: {error}")
+        if isinstance(error, UpstreamTimeout):
+            metrics.TIMEOUTS.labels(source, "upstream").inc()
+        if attempt + 1 < retries:
+            metrics.UPSTREAM_RETRIES.labels(source).inc()
+            await asyncio.sleep(retry_policy.backoff(attempt, delay))
+    raise UpstreamError(f"Impossibile ottenere una risposta da {url} dopo {retries} tentativi")
 
 
 def test_link(search_term):
@@ -353,298 +420,268 @@ def test_link(search_term):
         ])
 
 
-def livetv_scraper(search_term: str, target_tz: ZoneInfo):
-    base_url = 'https://livetv'
-    domain_suffix = '.me'
-    max_attempts = 2
-    base_attempt = 868
-    livetv_number = base_attempt
-
-    logging.info(f"Inizio scraping LiveTV{livetv_number} per: {search_term}")
+def load_livetv_schedule():
+    """Loader dello snapshot LiveTV: mirror sano → righe parsate (parsing nel thread dello snapshot)."""
     start_time = time.time()
+    with metrics.observe("LiveTV", "mirror_fetch"):
+        livetv_number, response = engine.run(livetv_mirrors.fetch('/enx/allupcoming/'))
+    logging.info(f"LiveTV{livetv_number} risposta in {time.time() - start_time:.2f}s")
+    with metrics.observe("LiveTV", "listing_parse"):
+        events = parse_livetv_listing(response.text, cache=_livetv_blocks)
+    _count_blocks("LiveTV", _livetv_blocks)
+    return events, {"site_url": livetv_mirrors.site_url(livetv_number), "mirror": livetv_number}
 
-    while livetv_number <= base_attempt + max_attempts:
-        site_url = f'{base_url}{livetv_number}{domain_suffix}'
-        path_upcoming = site_url + '/enx/allupcoming/'
 
-        try:
-            response = make_request_with_retry(path_upcoming)
-            response.raise_for_status()
-            logging.info(f"LiveTV{livetv_number} risposta in {time.time() - start_time:.2f}s")
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            risultati = []
-            visti = set()
-
-            for a in soup.select('a.live'):
-                row = a.find_parent('tr')
-                if not row:
-                    continue
-
-                left_td = row.select_one('td[width="34"]')
-                descrizione = ""
-                if left_td:
-                    img = left_td.find('img', alt=True)
-                    if img:
-                        descrizione = img['alt'].strip()
-
-                titolo = a.get_text(strip=True)
-                url = a.get('href', '')
-                if "_" in url:
-                    url = url.split("_")[0]
-
-                time_tag = row.find('span', class_='evdesc')
-                time_raw = time_tag.get_text(" ", strip=True) if time_tag else ""
-                orario = ""
-                if "(" in time_raw and ")" in time_raw:
-                    parts = time_raw.split("(", 1)
-                    before_paren = parts[0].strip()
-                    m = re.search(r"\b\d{1,2}:\d{2}\b", before_paren)
-                    orario = m.group(0) if m else before_paren
-
-                try:
-                    if orario:
-                        # LiveTV usa orario inglese (Europe/London)
-                        t = datetime.strptime(orario, "%H:%M").time()
-                        london_dt = datetime.now(ZoneInfo("Europe/London")).replace(
-                            hour=t.hour, minute=t.minute, second=0, microsecond=0
-                        )
-                        # converte nel fuso orario dell'utente
-                        local_dt = london_dt.astimezone(target_tz)
-                        orario_str = local_dt.strftime("%H:%M")
-                except Exception:
-                    orario_str = orario
-
-                if url in visti:
-                    continue
-                visti.add(url)
-
-                risultati.append({
-                    "title": titolo,
-                    "competition": descrizione,
-                    "time": orario_str,
-                    "url": url
-                })
-
-            # 🔹 usa metodo comune per ranking
-            selezionati = search_events_pipeline(
-                risultati,
-                search_term
-            )
-
-            events = []
-            for i, risultato in enumerate(selezionati, start=1):
-                url_partita = site_url + risultato["url"]
-                response_partita = make_request_with_retry(url_partita)
-                response_partita.raise_for_status()
-                logging.info(f"LiveTV dettagli partita in {time.time() - start_time:.2f}s")
-
-                soup_partita = BeautifulSoup(response_partita.text, 'html.parser')
-                links = soup_partita.find_all('a', href=lambda href: href and 'acestream://' in href)
-
-                event_title = f"{risultato['title']} | {risultato['competition']} | {risultato['time']}"
-                acestream_links = []
-                for link in links:
-                    tr = link.find_parent('tr')
-                    language, bitrate = None, None
-                    if tr:
-                        td = tr.find('td')
-                        img = td.find('img') if td else None
-                        if img:
-                            language = resolve_lang_code(img.get('title'), img.get('src'))
-                        bitrate_td = tr.find('td', class_='bitrate')
-                        bitrate = bitrate_td.get_text(strip=True) if bitrate_td else None
-
-                    acestream_links.append({
-                        "link": link['href'],
-                        "language": language,
-                        "bitrate": bitrate,
-                        "quality": bitrate_to_quality(bitrate)
-                    })
-
-                events.append({
-                    **risultato,
-                    "event_title": f"{risultato['title']} | {risultato['competition']} | {risultato['time']}",
-                    "acestream_links": acestream_links,
-                })
-                if i == 3:
-                    break
-
-            elapsed_time = time.time() - start_time
-            logging.info(f"Scraping LiveTV{livetv_number} completato in {elapsed_time:.2f}s")
-
-            return {"search_term": search_term, "events": events}
-
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Errore LiveTV: {e}")
-            livetv_number += 1
-            continue
+def _count_blocks(source: str, cache: BlockCache):
+    metrics.LISTING_BLOCKS.labels(source, "reused").inc(cache.reused)
+    metrics.LISTING_BLOCKS.labels(source, "parsed").inc(cache.parsed)
 
-    return {"source": f"LiveTV{livetv_number - 1}", "error": "Unable to connect to LiveTV"}
 
+def _platin_key(ev: dict):
+    # PlatinSport non ha pagine evento: competizione, titolo e inizio
+    return ev.get("competition"), ev.get("title"), ev.get("_start")
 
-def bitrate_to_quality(bitrate_str):
+
+def _on_schedule_delta(source: str, delta, snap):
     """
-    Converte un valore come '8000kbps' o '12000' nella qualità video approssimativa:
-    4K, UHD, FHD, HD o None.
-    Gestisce anche input None o non validi.
+    Applica il Delta di un refresh alle cache a valle: pagine evento delle
+    righe cambiate o sparite e risultati che contengono quegli eventi.
+    Le voci degli eventi invariati restano.
     """
-    if not bitrate_str:
-        return "SD"
-
-    # Estrae solo la parte numerica (es. '8000kbps' -> 8000)
-    import re
-    match = re.search(r'(\d+)', str(bitrate_str))
-    if not match:
-        return "SD"
-
-    bitrate = int(match.group(1))
-
-    if bitrate >= 15000:
-        return "4K"
-    elif bitrate >= 10000:
-        return "UHD"
-    elif bitrate >= 5000:
-        return "FHD"
-    elif bitrate >= 2500:
-        return "HD"
-    else:
-        return "SD"
+    for kind in ("added", "updated", "removed"):
+        metrics.SNAPSHOT_CHANGES.labels(source, kind).inc(len(getattr(delta, kind)))
+    key = providers.get(source).key
+    stale = {key(old) for old, _ in delta.updated} | {key(ev) for ev in delta.removed}
+    if not stale:
+        return
+    if source == "LiveTV":
+        for url in stale:
+            _DETAIL_CACHE.invalidate(url)
+
+    def affected(results):
+        return any(res["source"] == source and any(key(ev) in stale for ev in res["events"])
+                   for res in results)
+
+    dropped = _RESULT_CACHE.invalidate_where(affected)
+    logging.info(f"[SNAPSHOT] {source}: {len(stale)} eventi cambiati/spariti, {dropped} risultati in cache invalidati")
+
+
+def _localize(ev: dict, target_tz: ZoneInfo | None) -> dict:
+    """Copia dell'evento con l'orario nel fuso dell'utente, senza i campi interni."""
+    out = {k: v for k, v in ev.items() if k != "_start"}
+    start = ev.get("_start")
+    if start is not None:
+        out["time"] = start.astimezone(target_tz).strftime("%H:%M")
+    return out
 
 
-def parse_platin_events(html: str, target_tz: ZoneInfo):
-    soup = BeautifulSoup(html, "html.parser")
-    root = soup.select_one("div.myDiv1") or soup
+async def fetch_livetv_event(event_path: str) -> list[dict]:
+    """
+    Link della pagina evento, dalla cache se ancora validi. Le voci scadute
+    vengono rivalidate con If-None-Match/If-Modified-Since quando possibile.
+    La chiave è il path: sopravvive al cambio di mirror.
+    """
+    entry = _DETAIL_CACHE.peek(event_path)
+    if entry is not None and entry.fresh:
+        return entry.value
+    # la stessa pagina richiesta da più ricerche in parallelo si scarica una volta
+    return await _inflight_details.do(event_path, lambda: _download_livetv_event(event_path, entry))
+
+
+async def _download_livetv_event(event_path: str, entry) -> list[dict]:
+    headers = entry.conditional_headers() if entry is not None else None
+    with metrics.observe("LiveTV", "detail_fetch"):
+        _, response_partita = await livetv_mirrors.fetch(
+            event_path, lambda url: make_request_with_retry(url, headers=headers or None, source="LiveTV"))
+    if response_partita.status_code == 304 and entry is not None:
+        _DETAIL_CACHE.touch(event_path)
+        return entry.value
+
+    with metrics.observe("LiveTV", "detail_parse"):
+        acestream_links = await asyncio.to_thread(parse_livetv_event, response_partita.text)
+    entry = _DETAIL_CACHE.set(event_path, acestream_links,
+                              etag=response_partita.headers.get("ETag"),
+                              last_modified=response_partita.headers.get("Last-Modified"))
+    if SNAPSHOT_PERSIST:
+        _spawn(asyncio.to_thread(_save_detail, event_path, entry))
+    return acestream_links
+
+
+def _save_detail(event_path: str, entry):
+    try:
+        with db_session() as s:
+            save_detail_links(s, event_path, entry.value, entry.etag, entry.last_modified, entry.stored_at)
+    except Exception as e:
+        logging.error(f"[SNAPSHOT] Salvataggio pagina evento {event_path} fallito: {e}")
 
-    events = []
-    current_competition = None
 
-    for el in root.children:
-        # competizione
-        if getattr(el, "name", None) == "p":
-            current_competition = el.get_text(strip=True)
-            continue
+def _restore_details():
+    """Pagine evento salvate → _DETAIL_CACHE con la loro età (le scadute si rivalidano)."""
+    try:
+        with db_session() as s:
+            rows = load_detail_links(s, max_age=SNAPSHOT_WARM_MAX_AGE)
+    except Exception as e:
+        logging.error(f"[SNAPSHOT] Lettura pagine evento salvate fallita: {e}")
+        return
+    for path, links, etag, last_modified, fetched_at in rows:
+        _DETAIL_CACHE.set(path, links, etag=etag, last_modified=last_modified, stored_at=fetched_at)
+    logging.info(f"[SNAPSHOT] {len(rows)} pagine evento dal disco")
 
-        # evento
-        if getattr(el, "name", None) == "time":
-            dt = el.get("datetime") or el.get_text(strip=True)
-            hhmm = ""
-            if dt:
-                try:
-                    utc_dt = datetime.fromisoformat(dt.replace("Z", "+00:00"))
-                    local_dt = utc_dt.astimezone(target_tz)
-                    hhmm = local_dt.strftime("%H:%M")
-                except Exception:
-                    hhmm = el.get_text(strip=True)
-
-            # titolo = testo fino al primo link
-            match_title = ""
-            links = []
-            seen = set()
-
-            nxt = el.next_sibling
-            while nxt and getattr(nxt, "name", None) not in ("time", "p"):
-                if isinstance(nxt, str) and nxt.strip():
-                    if not match_title:
-                        match_title = nxt.strip()
-                elif getattr(nxt, "name", None) == "a":
-                    href = (nxt.get("href") or "").strip()
-                    if href.startswith("acestream://") and href not in seen:
-                        seen.add(href)
-                        lang = None
-                        span = nxt.find("span")
-                        channel_quality = nxt.get_text(strip=True)
-                        channel, quality = parse_channel_quality(channel_quality)
-                        if span:
-                            for cls in span.get("class", []):
-                                if cls.startswith("fi-"):
-                                    lang = cls.split("-", 1)[-1]
-                                    break
-                        links.append({
-                            "link": href,
-                            "language": lang,
-                            "channel": channel,
-                            "quality": quality
-                        })
-                nxt = nxt.next_sibling
-
-            if match_title and links:
-                events.append({
-                    "competition": current_competition,
-                    "time": hhmm,
-                    "title": match_title,
-                    "links": links
-                })
-
-    return events
-
-
-def parse_channel_quality(name: str):
-    """
-    Estrae il nome del canale e la qualità (4K, UHD, FHD, HD o None)
-    da una stringa come 'DAZN F1 4K' o 'SKY SPORT F1 FHD'.
-    """
-    match = re.search(r'\b(4K|UHD|FHD|HD)\b$', name.strip(), re.IGNORECASE)
-    if match:
-        quality = match.group(1).upper()
-        channel = re.sub(r'\b(4K|UHD|FHD|HD)\b$', '', name.strip(), flags=re.IGNORECASE).strip()
-    else:
-        quality = "SD"
-        channel = name.strip()
-    return channel, quality
+
+def _save_snapshot(snap):
+    with db_session() as s:
+        save_schedule(s, snap.source, snap.events, snap.meta, snap.fetched_at)
 
 
-def platinsport_scraper(search_term: str, target_tz: ZoneInfo):
-    logging.info(f"Inizio scraping PlatinSport per: {search_term}")
+def _restore_snapshot(source: str):
+    with db_session() as s:
+        return load_schedule(s, source, max_age=SNAPSHOT_WARM_MAX_AGE)
+
+
+async def livetv_scraper(search_term: str):
+    logging.info(f"Inizio ricerca LiveTV per: {search_term}")
     start_time = time.time()
-    site_url = "https://www.platinsport.com/"
 
-    try:
-        # 1) prendi link giornaliero
-        response = make_request_with_retry(site_url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        button = soup.find("button", string="ACESTREAM")
-        if not button:
-            return {"source": "PlatinSport", "error": "ACESTREAM button not found"}
+    # al primo avvio attende (con un limite) il caricamento dello snapshot senza bloccare il loop
+    snap = snapshots.peek("LiveTV") or await asyncio.to_thread(snapshots.get, "LiveTV")
+    if snap is None:
+        raise SourceError("Unable to connect to LiveTV")
+
+    # 🔹 usa metodo comune per ranking
+    with metrics.observe("LiveTV", "ranking"):
+        selezionati = (await asyncio.to_thread(
+            search_events_pipeline,
+            snap.index,
+            search_term
+        ))[:3]
+
+    # pagine evento in parallelo, entro il budget della ricerca: quello che resta
+    # del timeout della sorgente dopo snapshot e ranking, così le pagine già
+    # scaricate arrivano prima che wait_for scarti tutta la sorgente
+    remaining = providers.get("LiveTV").timeout - (time.time() - start_time) - LIVETV_DEADLINE_MARGIN
+    budget = max(0.0, min(LIVETV_DETAIL_BUDGET, remaining))
+    tasks = [asyncio.ensure_future(fetch_livetv_event(ev["url"])) for ev in selezionati]
+    done = set()
+    if tasks:
+        done, pending = await asyncio.wait(tasks, timeout=budget)
+        for t in pending:
+            t.cancel()
+        if pending:
+            metrics.TIMEOUTS.labels("LiveTV", "detail_budget").inc(len(pending))
+    logging.info(f"LiveTV dettagli partite in {time.time() - start_time:.2f}s "
+                 f"({len(done)}/{len(tasks)} entro il budget)")
+
+    events = []
+    errors = 0
+    for selezionato, t in zip(selezionati, tasks):
+        if t not in done:
+            continue
+        try:
+            acestream_links = t.result()
+        except (UpstreamError, NoHealthyMirror) as e:
+            logging.error(f"Errore LiveTV: {e}")
+            errors += 1
+            continue
+
+        events.append({
+            **selezionato,
+            "acestream_links": acestream_links,
+        })
+
+    if tasks and errors == len(tasks):
+        raise SourceError("Unable to connect to LiveTV")
+
+    elapsed_time = time.time() - start_time
+    logging.info(f"Ricerca LiveTV{snap.meta['mirror']} completata in {elapsed_time:.2f}s")
+
+    # partial: alcune pagine evento sono andate in timeout o in errore
+    return {"events": events, "partial": len(events) < len(tasks)}
 
-        parent_link = button.find_parent("a", href=True)
-        if not parent_link:
-            return {"source": "PlatinSport", "error": "Parent link not found"}
 
-        detailed_link = "https://" + parent_link["href"].split("https://")[-1].strip()
+def load_platin_schedule():
+    """Loader dello snapshot PlatinSport: home → link giornaliero → eventi parsati (UTC)."""
+    site_url = PLATINSPORT_URL
 
-        # 2) pagina con tutti gli eventi
-        detailed_response = make_request_with_retry(detailed_link)
+    # 1) prendi link giornaliero
+    with metrics.observe("PlatinSport", "listing_fetch"):
+        response = engine.run(make_request_with_retry(site_url, source="PlatinSport"))
+        response.raise_for_status()
+    detailed_link = parse_platin_daily_link(response.text)
+
+    # 2) pagina con tutti gli eventi
+    with metrics.observe("PlatinSport", "listing_fetch"):
+        detailed_response = engine.run(make_request_with_retry(detailed_link, source="PlatinSport"))
         detailed_response.raise_for_status()
-        parsed_events = parse_platin_events(detailed_response.text, target_tz)
+    with metrics.observe("PlatinSport", "listing_parse"):
+        events = parse_platin_events(detailed_response.text, cache=_platin_blocks)
+    _count_blocks("PlatinSport", _platin_blocks)
+    return events, {"daily_url": detailed_link}
 
-        if not parsed_events:
-            return {"search_term": search_term, "events": []}
 
-        # 3) ranking dei risultati
-        selezionati = search_events_pipeline(
-            parsed_events,
-            search_term
-        )
+async def platinsport_scraper(search_term: str):
+    logging.info(f"Inizio ricerca PlatinSport per: {search_term}")
+    start_time = time.time()
 
-        events = []
-        for ev in selezionati:
-            events.append({
-                **ev,
-                "event_title": f"{ev['title']} | {ev['competition']} | {ev['time']}",
-                "acestream_links": ev["links"],
-            })
+    snap = snapshots.peek("PlatinSport") or await asyncio.to_thread(snapshots.get, "PlatinSport")
+    if snap is None:
+        raise SourceError("Unable to connect to PlatinSport")
 
-        elapsed_time = time.time() - start_time
-        logging.info(f"Scraping PlatinSport completato in {elapsed_time:.2f}s")
+    if not snap.events:
+        return {"events": []}
+
+    # ranking dei risultati
+    with metrics.observe("PlatinSport", "ranking"):
+        selezionati = await asyncio.to_thread(
+            search_events_pipeline,
+            snap.index,
+            search_term
+        )
 
-        return {"search_term": search_term, "events": events}
+    events = []
+    for ev in selezionati:
+        events.append({
+            **ev,
+            "acestream_links": ev["links"],
+        })
 
-    except Exception as e:
-        logging.error(f"Errore PlatinSport: {e}")
-        return {"source": "PlatinSport", "error": str(e)}
+    elapsed_time = time.time() - start_time
+    logging.info(f"Ricerca PlatinSport completata in {elapsed_time:.2f}s")
+
+    return {"events": events}
+
+
+retry_policy = RetryPolicy()
+
+livetv_mirrors = MirrorManager(partial(make_request_with_retry, source="LiveTV"),
+                               base_url=os.getenv("LIVETV_BASE_URL", "https://livetv"),
+                               suffix=os.getenv("LIVETV_DOMAIN_SUFFIX", ".me"),
+                               start=int(os.getenv("LIVETV_MIRROR_START", "868")))
+livetv_mirrors.start(engine.loop)
+# connessioni calde verso gli host upstream prima delle prime ricerche
+engine.submit(engine.warm_up([livetv_mirrors.site_url() + "/", PLATINSPORT_URL]))
+
+_inflight_searches = SingleFlight()
+_inflight_details = SingleFlight()
+link_prober = LinkProber(engine.get)
+
+# sorgenti interrogate in parallelo da /acestream; per aggiungerne una basta registrarla qui
+providers = ProviderRegistry()
+providers.register("LiveTV", livetv_scraper, loader=load_livetv_schedule, key=lambda ev: ev["url"])
+providers.register("PlatinSport", platinsport_scraper, loader=load_platin_schedule, key=_platin_key)
+# righe/sezioni dell'ultimo palinsesto: a ogni refresh si riparsano solo quelle cambiate
+_livetv_blocks = BlockCache()
+_platin_blocks = BlockCache()
+
+if SNAPSHOT_PERSIST:
+    _restore_details()
+snapshots = SnapshotStore(indexer=make_indexer(SEARCH_BACKEND),
+                          save=_save_snapshot if SNAPSHOT_PERSIST else None,
+                          restore=_restore_snapshot if SNAPSHOT_PERSIST else None)
+for provider in providers:
+    if provider.loader is not None:
+        snapshots.register(provider.name, provider.loader, key=provider.key)
+snapshots.subscribe(_on_schedule_delta)
+snapshots.start()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,118 @@
+# backend/merge.py
+import os
+import re
+from datetime import timedelta
+
+from rapidfuzz import fuzz
+
+from search import _clean
+
+# due eventi di sorgenti diverse sono lo stesso match se iniziano entro questa finestra
+# e i titoli puliti si somigliano almeno quanto la soglia (token_set_ratio)
+MERGE_TIME_WINDOW = timedelta(minutes=float(os.getenv("MERGE_TIME_WINDOW_MINUTES", "20")))
+MERGE_TITLE_THRESHOLD = float(os.getenv("MERGE_TITLE_THRESHOLD", "85"))
+
+_CID = re.compile(r"^acestream://([0-9a-f]{40})", re.IGNORECASE)
+_QUALITY_RANK = {"SD": 0, "HD": 1, "FHD": 2, "UHD": 3, "4K": 4}
+
+
+def content_id(link: str | None) -> str | None:
+    """CID di un link acestream://<40 hex>, minuscolo; None se non riconosciuto."""
+    m = _CID.match((link or "").strip())
+    return m.group(1).lower() if m else None
+
+
+def _merge_link(into: dict, other: dict, source: str):
+    """Completa i metadati mancanti; la qualità tiene la migliore nota."""
+    for k, v in other.items():
+        if v and not into.get(k):
+            into[k] = v
+    q_into, q_other = into.get("quality"), other.get("quality")
+    if _QUALITY_RANK.get(q_other, -1) > _QUALITY_RANK.get(q_into, -1):
+        into["quality"] = q_other
+    if source not in into["sources"]:
+        into["sources"].append(source)
+
+
+def _same_event(a: dict, b: dict) -> bool:
+    # la finestra vale sempre: i canali 24/7 condividono lo stesso CID fra partite diverse
+    sa, sb = a["event"].get("_start"), b["event"].get("_start")
+    if sa is None or sb is None or abs(sa - sb) > MERGE_TIME_WINDOW:
+        return False
+    if a["cids"] & b["cids"]:
+        return True
+    return fuzz.token_set_ratio(a["title"], b["title"]) >= MERGE_TITLE_THRESHOLD
+
+
+def merge_results(results: list[dict], search_term: str) -> list[dict]:
+    """
+    Fonde gli envelope delle sorgenti in uno solo: gli eventi che coincidono
+    (stesso orario, più un CID in comune o un titolo simile) diventano un
+    evento unico, con al più un evento per sorgente, e i link sono
+    deduplicati per CID, con i metadati combinati.
+    Gli orari restano in UTC (`_start`): il fuso si applica dopo.
+    """
+    items = []
+    for res in results:
+        for ev in res["events"]:
+            links = ev.get("acestream_links") or []
+            items.append({
+                "source": res["source"],
+                "event": ev,
+                "title": _clean(ev.get("title") or ""),
+                "cids": {cid for cid in map(content_id, (l.get("link") for l in links)) if cid},
+            })
+
+    # union-find sugli eventi che coincidono; un gruppo ha al più un evento per sorgente
+    parent = list(range(len(items)))
+    group_sources = [{item["source"]} for item in items]
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(items)):
+        for j in range(i + 1, len(items)):
+            ri, rj = find(i), find(j)
+            if ri == rj or group_sources[ri] & group_sources[rj]:
+                continue
+            if _same_event(items[i], items[j]):
+                parent[rj] = ri
+                group_sources[ri] |= group_sources[rj]
+
+    groups: dict[int, list[dict]] = {}
+    for i, item in enumerate(items):
+        groups.setdefault(find(i), []).append(item)
+
+    events = []
+    for members in groups.values():  # in ordine di prima comparsa
+        base = {k: v for k, v in members[0]["event"].items() if k not in ("acestream_links", "links")}
+        base["_score"] = max((m["event"].get("_score", 0) for m in members), default=0)
+        base["sources"] = list(dict.fromkeys(m["source"] for m in members))
+        by_cid: dict[str, dict] = {}
+        links = []
+        for m in members:
+            for link in m["event"].get("acestream_links") or []:
+                cid = content_id(link.get("link"))
+                if cid is None:
+                    links.append({**link, "sources": [m["source"]]})
+                elif cid in by_cid:
+                    _merge_link(by_cid[cid], link, m["source"])
+                else:
+                    by_cid[cid] = {**link, "sources": [m["source"]]}
+                    links.append(by_cid[cid])
+        base["acestream_links"] = links
+        events.append(base)
+
+    errors = [r["error"] for r in results if r["error"]]
+    return [{
+        "source": "merged",
+        "search_term": search_term,
+        "events": events,
+        # errore solo se nessuna sorgente ha risposto
+        "error": errors[0] if errors and len(errors) == len(results) else None,
+        "partial": any(r["error"] or r["partial"] for r in results),
+        "sources": [r["source"] for r in results if not r["error"]],
+    }]
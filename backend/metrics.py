@@ -0,0 +1,67 @@
+# backend/metrics.py
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# fasi: mirror_fetch, listing_fetch, listing_parse, ranking, detail_fetch, detail_parse, request
+STAGE_SECONDS = Histogram(
+    "scrape_stage_seconds",
+    "Durata delle fasi della pipeline di scraping",
+    ["source", "stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0),
+)
+UPSTREAM_RETRIES = Counter(
+    "scrape_upstream_retries_total",
+    "Tentativi upstream falliti e ripetuti",
+    ["source"],
+)
+TIMEOUTS = Counter(
+    "scrape_timeouts_total",
+    "Timeout per sorgente e fase (richiesta upstream, budget pagine evento, sorgente intera)",
+    ["source", "stage"],
+)
+CIRCUIT_REJECTIONS = Counter(
+    "scrape_circuit_rejections_total",
+    "Richieste rifiutate subito perché il circuito dell'host è aperto",
+    ["source"],
+)
+ERRORS = Counter(
+    "scrape_errors_total",
+    "Errori per sorgente e fase",
+    ["source", "stage"],
+)
+RESULT_CACHE = Counter(
+    "acestream_result_cache_total",
+    "Esito della lookup nella cache risultati",
+    ["state"],  # fresh, stale, miss
+)
+LISTING_BLOCKS = Counter(
+    "scrape_listing_blocks_total",
+    "Blocchi del palinsesto (righe/sezioni) riusati dalla cache o estratti di nuovo",
+    ["source", "outcome"],  # reused, parsed
+)
+SNAPSHOT_CHANGES = Counter(
+    "snapshot_changes_total",
+    "Eventi aggiunti, cambiati o spariti a ogni refresh del palinsesto",
+    ["source", "kind"],  # added, updated, removed
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+@contextmanager
+def observe(source: str, stage: str):
+    """Misura la durata del blocco (anche con await all'interno) nell'istogramma della fase."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.labels(source, stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(source, stage).observe(time.perf_counter() - start)
+
+
+def render() -> bytes:
+    return generate_latest()
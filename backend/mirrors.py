@@ -0,0 +1,188 @@
+# backend/mirrors.py
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from engine import UpstreamStatusError
+
+MIRROR_PROBE_SECONDS = float(os.getenv("MIRROR_PROBE_SECONDS", "120"))
+
+
+class NoHealthyMirror(Exception):
+    pass
+
+
+@dataclass
+class MirrorHealth:
+    ok: bool | None = None  # None = mai provato
+    checked_at: float = 0.0
+    latency: float | None = None
+    failures: int = 0
+
+
+# fetch: url -> awaitable response, solleva eccezione se fallisce
+Fetch = Callable[[str], Awaitable]
+
+
+def _client_error(e: BaseException) -> bool:
+    """4xx su un path: il mirror risponde, non conta come guasto."""
+    return isinstance(e, UpstreamStatusError) and e.client_error
+
+
+class MirrorManager:
+    """
+    Mirror numerati (livetv868.me, livetv869.me, ...): ricorda l'ultimo sano,
+    li sonda in background scorrendo in avanti quando la numerazione cambia
+    e, se quello corrente cade, mette in gara i migliori candidati in parallelo.
+    """
+
+    def __init__(self, fetch: Fetch, base_url: str, suffix: str, start: int,
+                 scan_ahead: int = 3, race_width: int = 3, max_windows: int = 3,
+                 probe_path: str = "/", probe_interval: float = MIRROR_PROBE_SECONDS):
+        self._fetch = fetch
+        self.base_url = base_url
+        self.suffix = suffix
+        self.current = start
+        self.scan_ahead = scan_ahead
+        self.race_width = race_width
+        self.max_windows = max_windows
+        self.probe_path = probe_path
+        self.probe_interval = probe_interval
+        self.health: dict[int, MirrorHealth] = {}
+        self._lock = threading.Lock()
+        self._probe_task = None
+
+    def site_url(self, number: int | None = None) -> str:
+        return f"{self.base_url}{self.current if number is None else number}{self.suffix}"
+
+    # ---------- fetch ----------
+
+    async def fetch(self, path: str, fetch: Fetch | None = None):
+        """
+        GET path sul mirror corrente; se fallisce (o è già noto come giù)
+        corre sui candidati. Ritorna (numero, response). Un 4xx (es. pagina
+        evento rimossa) arriva al chiamante senza toccare la salute del mirror.
+        """
+        current = self.current
+        h = self.health.get(current)
+        if h is None or h.ok is not False:
+            try:
+                return current, await self._try(current, path, fetch)
+            except Exception as e:
+                if _client_error(e):
+                    raise
+                logging.warning(f"[MIRROR] {self.site_url(current)} non risponde: {e}")
+            return await self._race(self._candidates(exclude=current), path, fetch)
+        # corrente giù all'ultima verifica: lo rimettiamo in gara con gli altri
+        return await self._race([current] + self._candidates(exclude=current)[:self.race_width - 1], path, fetch)
+
+    async def _try(self, number: int, path: str, fetch: Fetch | None = None):
+        start_time = time.time()
+        try:
+            response = await (fetch or self._fetch)(self.site_url(number) + path)
+        except Exception as e:
+            # solo rete, timeout e 5xx contano come guasto del mirror
+            self._mark(number, ok=_client_error(e), latency=time.time() - start_time)
+            raise
+        self._mark(number, ok=True, latency=time.time() - start_time)
+        return response
+
+    async def _race(self, numbers: list[int], path: str, fetch: Fetch | None = None):
+        if not numbers:
+            raise NoHealthyMirror("Nessun mirror candidato")
+        tasks = {asyncio.ensure_future(self._try(n, path, fetch)): n for n in numbers}
+        pending = set(tasks)
+        client_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        winner = tasks[t]
+                        self._promote(winner)
+                        return winner, t.result()
+                    if client_error is None and _client_error(t.exception()):
+                        client_error = t.exception()
+        finally:
+            for t in pending:
+                t.cancel()
+        if client_error is not None:
+            raise client_error
+        raise NoHealthyMirror(f"Nessun mirror raggiungibile tra {numbers}")
+
+    # ---------- stato ----------
+
+    def _mark(self, number: int, ok: bool, latency: float | None = None):
+        with self._lock:
+            h = self.health.setdefault(number, MirrorHealth())
+            h.ok = ok
+            h.checked_at = time.time()
+            if ok:
+                h.latency = latency
+                h.failures = 0
+            else:
+                h.failures += 1
+
+    def _promote(self, number: int):
+        with self._lock:
+            if self.current != number:
+                logging.info(f"[MIRROR] Passo da {self.site_url()} a {self.site_url(number)}")
+                self.current = number
+
+    def _candidates(self, exclude: int | None = None) -> list[int]:
+        """Finestra attorno al corrente, ordinata per salute: sani → mai provati → falliti."""
+        window = [self.current + i for i in range(1, self.scan_ahead + 1)] + [self.current - 1]
+        window = [n for n in window if n != exclude and n > 0]
+
+        def rank(n):
+            # a parità di salute, preferisci i numeri successivi (la numerazione avanza)
+            h = self.health.get(n)
+            pos = window.index(n)
+            if h is None or h.ok is None:
+                return 1, 0.0, pos
+            if h.ok:
+                return 0, h.latency or 0.0, pos
+            return 2, float(h.failures), pos
+
+        return sorted(window, key=rank)[:self.race_width]
+
+    # ---------- probe in background ----------
+
+    async def probe(self):
+        """
+        Sonda il corrente e la finestra successiva; se sono tutti giù continua
+        in avanti (la numerazione cambia nel tempo) fino a `max_windows` finestre.
+        """
+        first = self.current
+        for _ in range(self.max_windows):
+            numbers = list(range(first, first + self.scan_ahead + 1))
+            outcomes = await asyncio.gather(*(self._try(n, self.probe_path) for n in numbers),
+                                            return_exceptions=True)
+            healthy = [n for n, res in zip(numbers, outcomes) if not isinstance(res, BaseException)]
+            if healthy:
+                if self.current not in healthy:
+                    self._promote(min(healthy))
+                return
+            first = numbers[-1] + 1
+        logging.warning(f"[MIRROR] Nessun mirror sano tra {self.current} e {first - 1}")
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Avvia la sonda periodica sul loop indicato (thread-safe)."""
+        if self._probe_task is None:
+            self._probe_task = asyncio.run_coroutine_threadsafe(self._run(), loop)
+
+    def stop(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                await self.probe()
+            except Exception as e:
+                logging.error(f"[MIRROR] Probe fallita: {e}")
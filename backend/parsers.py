@@ -0,0 +1,665 @@
+# backend/parsers.py
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html  # backend veloce (opzionale)
+except ImportError:  # pragma: no cover
+    lxml = None
+
+# "lxml" (default se installato) oppure "html.parser"
+HTML_PARSER = os.getenv("HTML_PARSER", "lxml" if lxml is not None else "html.parser")
+if HTML_PARSER == "lxml" and lxml is None:
+    HTML_PARSER = "html.parser"
+
+UTC = timezone.utc
+# LiveTV pubblica gli orari in ora inglese
+LONDON = ZoneInfo("Europe/London")
+
+# parsing ristretto ai soli contenitori che servono agli estrattori
+ONLY_PLATIN_EVENTS = SoupStrainer("div", class_="myDiv1")
+ONLY_PLATIN_TABLE = SoupStrainer("div", class_="entry")
+ONLY_LINKS = SoupStrainer("a")
+# ogni quante estrazioni la BlockCache si confronta con il parse completo (la prima sempre)
+BLOCK_CACHE_VERIFY_EVERY = int(os.getenv("BLOCK_CACHE_VERIFY_EVERY", "20"))
+
+
+def make_soup(html: str, only: SoupStrainer | None = None) -> BeautifulSoup:
+    """BeautifulSoup con il backend configurato; `only` limita l'albero ai contenitori utili."""
+    return BeautifulSoup(html, HTML_PARSER, parse_only=only)
+
+
+def _lxml_doc(html: str):
+    """Documento lxml, None se il markup non è gestibile (si ripiega su BeautifulSoup)."""
+    try:
+        return lxml.html.document_fromstring(html)
+    except (ValueError, lxml.etree.ParserError):
+        return None
+
+
+def _lxml_text(el, sep: str = "") -> str:
+    """Equivalente di Tag.get_text(sep, strip=True) su un elemento lxml (niente commenti/script)."""
+    parts = []
+
+    def walk(node):
+        if isinstance(node.tag, str) and node.tag not in ("script", "style"):
+            if node.text and node.text.strip():
+                parts.append(node.text.strip())
+            for child in node:
+                walk(child)
+                if child.tail and child.tail.strip():
+                    parts.append(child.tail.strip())
+        else:
+            for child in node:
+                if child.tail and child.tail.strip():
+                    parts.append(child.tail.strip())
+
+    walk(el)
+    return sep.join(parts)
+
+
+def _lxml_has_class(el, cls: str) -> bool:
+    return cls in (el.get("class") or "").split()
+
+
+def _lxml_parent(el, tag: str):
+    parent = el.getparent()
+    while parent is not None and parent.tag != tag:
+        parent = parent.getparent()
+    return parent
+
+
+class BlockCache:
+    """
+    Eventi estratti per blocco di HTML (riga o sezione), indicizzati per hash
+    del testo: a ogni refresh si estraggono solo i blocchi nuovi o cambiati,
+    gli altri riusano gli stessi dict (quindi si riconoscono anche per identità).
+    Tiene solo i blocchi dell'ultima pagina. Un'istanza per sorgente.
+
+    Ogni `verify_every` estrazioni il risultato si confronta con il parse
+    completo: se differiscono (markup che lo split non segue) la cache si
+    spegne e da lì in poi si usa solo il parse completo.
+    """
+
+    def __init__(self, verify_every: int = BLOCK_CACHE_VERIFY_EVERY):
+        self._blocks: dict[int, list[dict]] = {}
+        self.reused = 0
+        self.parsed = 0
+        self.verify_every = verify_every
+        self.enabled = True
+        self._runs = 0
+
+    def extract(self, blocks: list[str], fn, salt=None, full=None) -> list[dict]:
+        """
+        `fn(block) -> [eventi]` solo per i blocchi mai visti; `salt` entra
+        nell'hash (es. la data). `full() -> [eventi]` è il parse completo per la verifica.
+        """
+        out = self._extract(blocks, fn, salt)
+        if full is not None and self.verify_every > 0 and self._runs % self.verify_every == 0:
+            expected = full()
+            if expected != out:
+                logging.warning(f"[PARSE] Blocchi diversi dal parse completo ({len(out)} vs "
+                                f"{len(expected)} eventi): cache dei blocchi disattivata")
+                self.enabled = False
+                self._blocks = {}
+                out = expected
+        self._runs += 1
+        return out
+
+    def _extract(self, blocks: list[str], fn, salt) -> list[dict]:
+        current: dict[int, list[dict]] = {}
+        out = []
+        reused = parsed = 0
+        for block in blocks:
+            key = hash((salt, block))
+            items = current.get(key)
+            if items is None:
+                items = self._blocks.get(key)
+            if items is None:
+                items = fn(block)
+                parsed += 1
+            else:
+                reused += 1
+            current[key] = items
+            out.extend(items)
+        self._blocks = current
+        self.reused, self.parsed = reused, parsed
+        return out
+
+
+LANG_CODE = {
+    # ID -> code
+    "1": "ru",
+    "2": "uk",
+    "3": "ua",
+    "4": "nl",
+    "5": "sa",  # "ae" se preferisci EAU
+    "6": "cn",
+    "7": "es",
+    "8": "pl",
+    "9": "br",
+    "10": "tr",
+    "11": "fr",
+    "12": "it",
+    "13": "de",
+    "14": "ro",
+
+    # name (lowercase) -> code
+    "russian": "ru",
+    "english": "uk",
+    "ukrainian": "ua",
+    "dutch": "nl",
+    "arabic": "sa",
+    "chinese": "cn",
+    "spanish": "es",
+    "polish": "pl",
+    "portuguese": "pt",
+    "turkish": "tr",
+    "french": "fr",
+    "italian": "it",
+    "german": "de",
+    "romanian": "ro",
+}
+
+
+def resolve_lang_code(title: str | None, src: str | None) -> str | None:
+    # prova dal title (nome lingua)
+    if title:
+        key = title.strip().lower()
+        code = LANG_CODE.get(key)
+        if code:
+            return code
+    # fallback: prova dall'ID nel src
+    if src:
+        m = re.search(r'/linkflag/(\d+)\.png', src)
+        if m:
+            return LANG_CODE.get(m.group(1))
+    return None
+
+
+def bitrate_to_quality(bitrate_str):
+    """
+    Converte un valore come '8000kbps' o '12000' nella qualità video approssimativa:
+    4K, UHD, FHD, HD o None.
+    Gestisce anche input None o non validi.
+    """
+    if not bitrate_str:
+        return "SD"
+
+    # Estrae solo la parte numerica (es. '8000kbps' -> 8000)
+    import re
+    match = re.search(r'(\d+)', str(bitrate_str))
+    if not match:
+        return "SD"
+
+    bitrate = int(match.group(1))
+
+    if bitrate >= 15000:
+        return "4K"
+    elif bitrate >= 10000:
+        return "UHD"
+    elif bitrate >= 5000:
+        return "FHD"
+    elif bitrate >= 2500:
+        return "HD"
+    else:
+        return "SD"
+
+
+def parse_channel_quality(name: str):
+    """
+    Estrae il nome del canale e la qualità (4K, UHD, FHD, HD o None)
+    da una stringa come 'DAZN F1 4K' o 'SKY SPORT F1 FHD'.
+    """
+    match = re.search(r'\b(4K|UHD|FHD|HD)\b$', name.strip(), re.IGNORECASE)
+    if match:
+        quality = match.group(1).upper()
+        channel = re.sub(r'\b(4K|UHD|FHD|HD)\b$', '', name.strip(), flags=re.IGNORECASE).strip()
+    else:
+        quality = "SD"
+        channel = name.strip()
+    return channel, quality
+
+
+def parse_platin_table(html: str):
+    soup = make_soup(html, ONLY_PLATIN_TABLE)
+    items = []
+    current_league = ""
+
+    # la pagina reale ha più tabelle; qui prendiamo tutte le righe
+    for tr in soup.select("div.entry table tbody tr"):
+        # riga di intestazione lega
+        stil = tr.select_one("td.stil")
+        if stil:
+            current_league = stil.get_text(" ", strip=True)
+            continue
+
+        tds = tr.find_all("td")
+        if len(tds) < 3:
+            continue
+
+        # orario (preferisci <time>, fallback al testo del td)
+        t_time = tr.select_one("td.boy time")
+        time_txt = (t_time.get_text(strip=True) if t_time else tds[0].get_text(strip=True))
+
+        # titolo partita
+        title_txt = tds[1].get_text(" ", strip=True)
+
+        # link bottone ACESTREAM
+        a = tr.select_one("td.boy2 a[href]")
+        if not a:
+            continue
+        href = a["href"].strip()
+
+        # molti link sono del tipo bc.vc/.../https://www.platinsport.com/link/...
+        # → estrai l'ultima https://
+        if "https://" in href:
+            target = "https://" + href.split("https://")[-1]
+        else:
+            target = href
+
+        items.append({
+            "league": current_league,
+            "time": time_txt,
+            "title": title_txt,
+            "href": target,
+        })
+
+    return items
+
+
+_PLATIN_ROOT = re.compile(r"""<div\b[^>]*\bclass=["'][^"']*\bmyDiv1\b[^"']*["'][^>]*>""", re.IGNORECASE)
+# contenitori con tag di chiusura obbligatorio: un <p> al loro interno non è figlio diretto
+_PLATIN_NESTING = re.compile(
+    r"<(/?)(div|table|section|article|aside|ul|ol|span|form|center|font|blockquote)\b[^>]*>|<p[\s>]",
+    re.IGNORECASE)
+_DIV_TAG = re.compile(r"<(/?)div\b[^>]*>", re.IGNORECASE)
+
+
+def _container_end(html: str, start: int) -> int | None:
+    """Posizione del </div> che chiude il div aperto prima di `start`; None se non bilanciato."""
+    depth = 1
+    for m in _DIV_TAG.finditer(html, start):
+        depth += -1 if m.group(1) else 1
+        if depth == 0:
+            return m.start()
+    return None
+
+
+def _platin_sections(html: str, start: int, end: int) -> list[str]:
+    """Contenuto del contenitore tagliato prima di ogni <p> figlio diretto."""
+    cuts = [start]
+    depth = 0
+    for m in _PLATIN_NESTING.finditer(html, start, end):
+        if m.group(2) is None:
+            if depth == 0:
+                cuts.append(m.start())
+        elif m.group(1):
+            depth = max(depth - 1, 0)
+        else:
+            depth += 1
+    cuts.append(end)
+    return [html[a:b] for a, b in zip(cuts, cuts[1:]) if b > a]
+
+
+def parse_platin_events(html: str, target_tz: ZoneInfo | None = UTC, cache: BlockCache | None = None):
+    """
+    Eventi della pagina giornaliera: "time" nel fuso indicato, "_start" in UTC.
+    Con `cache` la pagina si divide in sezioni (un <p> di competizione e i suoi
+    eventi) e si riparsano solo le sezioni cambiate dall'ultima volta.
+    """
+    root = _PLATIN_ROOT.search(html) if cache is not None and cache.enabled else None
+    end = _container_end(html, root.end()) if root is not None else None
+    if end is None:
+        return _parse_platin_events(html, target_tz)
+    # solo il contenuto del contenitore: quello che segue (footer, ...) non sono eventi
+    return cache.extract(
+        _platin_sections(html, root.end(), end),
+        lambda section: _parse_platin_events(f'<div class="myDiv1">{section}</div>', target_tz),
+        salt=str(target_tz),
+        full=lambda: _parse_platin_events(html, target_tz))
+
+
+def _parse_platin_events(html: str, target_tz: ZoneInfo | None = UTC):
+    soup = make_soup(html, ONLY_PLATIN_EVENTS)
+    root = soup.select_one("div.myDiv1")
+    if root is None:
+        # pagina senza contenitore: serve l'albero completo
+        root = make_soup(html)
+
+    events = []
+    current_competition = None
+
+    for el in root.children:
+        # competizione
+        if getattr(el, "name", None) == "p":
+            current_competition = el.get_text(strip=True)
+            continue
+
+        # evento
+        if getattr(el, "name", None) == "time":
+            dt = el.get("datetime") or el.get_text(strip=True)
+            hhmm = ""
+            utc_dt = None
+            if dt:
+                try:
+                    utc_dt = datetime.fromisoformat(dt.replace("Z", "+00:00"))
+                    # senza offset PlatinSport intende UTC
+                    utc_dt = utc_dt.replace(tzinfo=UTC) if utc_dt.tzinfo is None else utc_dt.astimezone(UTC)
+                    local_dt = utc_dt.astimezone(target_tz)
+                    hhmm = local_dt.strftime("%H:%M")
+                except Exception:
+                    utc_dt = None
+                    hhmm = el.get_text(strip=True)
+
+            # titolo = testo fino al primo link
+            match_title = ""
+            links = []
+            seen = set()
+
+            nxt = el.next_sibling
+            while nxt and getattr(nxt, "name", None) not in ("time", "p"):
+                if isinstance(nxt, str) and nxt.strip():
+                    if not match_title:
+                        match_title = nxt.strip()
+                elif getattr(nxt, "name", None) == "a":
+                    href = (nxt.get("href") or "").strip()
+                    if href.startswith("acestream://") and href not in seen:
+                        seen.add(href)
+                        lang = None
+                        span = nxt.find("span")
+                        channel_quality = nxt.get_text(strip=True)
+                        channel, quality = parse_channel_quality(channel_quality)
+                        if span:
+                            for cls in span.get("class", []):
+                                if cls.startswith("fi-"):
+                                    lang = cls.split("-", 1)[-1]
+                                    break
+                        links.append({
+                            "link": href,
+                            "language": lang,
+                            "channel": channel,
+                            "quality": quality
+                        })
+                nxt = nxt.next_sibling
+
+            if match_title and links:
+                events.append({
+                    "competition": current_competition,
+                    "time": hhmm,
+                    "title": match_title,
+                    "links": links,
+                    "_start": utc_dt,
+                })
+
+    return events
+
+
+def parse_platin_daily_link(html: str) -> str:
+    """Link alla pagina giornaliera dal bottone ACESTREAM della home PlatinSport."""
+    soup = make_soup(html, ONLY_LINKS)
+    button = soup.find("button", string="ACESTREAM")
+    if not button:
+        raise ValueError("ACESTREAM button not found")
+
+    parent_link = button.find_parent("a", href=True)
+    if not parent_link:
+        raise ValueError("Parent link not found")
+
+    href = parent_link["href"].strip()
+    # spesso è del tipo bc.vc/.../https://www.platinsport.com/link/... → estrai l'ultima https://
+    if "https://" in href:
+        return "https://" + href.split("https://")[-1].strip()
+    return href
+
+
+_HHMM = re.compile(r"\b(\d{1,2}):(\d{2})\b")
+_DAY_MONTH = re.compile(r"\b(\d{1,2})\s+([A-Za-z]+)\b")
+_MONTHS = {m: i for i, m in enumerate(
+    ["january", "february", "march", "april", "may", "june", "july",
+     "august", "september", "october", "november", "december"], start=1)}
+
+
+class _LondonClock:
+    """
+    Ora inglese → UTC per una pagina: "oggi" si legge una volta sola e
+    l'offset di Europe/London una volta per data (non per riga), tranne nei
+    due giorni del cambio d'ora, dove si calcola per orario.
+    """
+
+    def __init__(self, now: datetime | None = None):
+        self.today = (now or datetime.now(LONDON)).astimezone(LONDON).date()
+        self._offsets: dict[date, timedelta | None] = {}
+
+    def resolve_date(self, text: str) -> date:
+        m = _DAY_MONTH.search(text)
+        month = _MONTHS.get(m.group(2).lower()) if m else None
+        if month:
+            candidates = []
+            for year in (self.today.year - 1, self.today.year, self.today.year + 1):
+                try:
+                    candidates.append(date(year, month, int(m.group(1))))
+                except ValueError:
+                    pass
+            if candidates:
+                # l'anno non c'è: quello più vicino a oggi (dicembre → gennaio)
+                return min(candidates, key=lambda d: abs(d - self.today))
+        if "tomorrow" in text.lower():
+            return self.today + timedelta(days=1)
+        return self.today
+
+    def to_utc(self, giorno: date, hour: int, minute: int) -> datetime | None:
+        if hour > 23 or minute > 59:
+            return None
+        if giorno not in self._offsets:
+            first = datetime(giorno.year, giorno.month, giorno.day, tzinfo=LONDON).utcoffset()
+            last = datetime(giorno.year, giorno.month, giorno.day, 23, 59, tzinfo=LONDON).utcoffset()
+            # None = giorno del cambio d'ora: l'offset dipende dall'orario
+            self._offsets[giorno] = first if first == last else None
+        offset = self._offsets[giorno]
+        if offset is None:
+            return datetime(giorno.year, giorno.month, giorno.day, hour, minute, tzinfo=LONDON).astimezone(UTC)
+        return datetime(giorno.year, giorno.month, giorno.day, hour, minute, tzinfo=UTC) - offset
+
+
+_ROW_TAGS = re.compile(r"<(/?)(table|tr|a)\b([^>]*)>", re.IGNORECASE)
+_CLASS_ATTR = re.compile(r"""\bclass\s*=\s*["']?([^"'>]*)""", re.IGNORECASE)
+
+
+def _livetv_blocks(html: str) -> list[str]:
+    """
+    Le righe <tr> che contengono un a.live (la più vicina, come nel parse
+    completo), seguendo l'annidamento delle tabelle; le righe dentro un'altra
+    riga restano nel blocco esterno.
+    """
+    spans: list[list[int]] = []  # [inizio, fine] di ogni <tr>
+    frames: list[int | None] = [None]  # <tr> aperto per livello di <table>
+    rows: set[int] = set()
+    for m in _ROW_TAGS.finditer(html):
+        closing, tag = m.group(1), m.group(2).lower()
+        if tag == "a":
+            if closing or "live" not in m.group(3):
+                continue
+            cls = _CLASS_ATTR.search(m.group(3))
+            if cls and "live" in cls.group(1).split():
+                row = next((f for f in reversed(frames) if f is not None), None)
+                if row is not None:
+                    rows.add(row)
+        elif tag == "table":
+            if closing:
+                if len(frames) > 1:
+                    if frames[-1] is not None:
+                        spans[frames[-1]][1] = m.start()
+                    frames.pop()
+            else:
+                frames.append(None)
+        elif closing:  # </tr>
+            if frames[-1] is not None:
+                spans[frames[-1]][1] = m.end()
+                frames[-1] = None
+        else:  # <tr>: chiude implicitamente quello aperto allo stesso livello
+            if frames[-1] is not None:
+                spans[frames[-1]][1] = m.start()
+            spans.append([m.start(), len(html)])
+            frames[-1] = len(spans) - 1
+
+    blocks = []
+    last_end = -1
+    for start, end in sorted((spans[i] for i in rows), key=lambda span: (span[0], -span[1])):
+        if start >= last_end:
+            blocks.append(html[start:end])
+            last_end = end
+    return blocks
+
+
+def parse_livetv_listing(html: str, now: datetime | None = None, cache: BlockCache | None = None) -> list[dict]:
+    """
+    Estrae le righe della pagina allupcoming. "time" resta l'orario inglese
+    della pagina, "_start" è l'inizio in UTC (None se non ricavabile).
+    Con `cache` si estraggono solo le righe <tr> nuove o cambiate dall'ultima volta.
+    """
+    clock = _LondonClock(now)
+    if cache is None or not cache.enabled:
+        righe = [_livetv_event(row, clock) for row in _livetv_rows(html)]
+    else:
+        # la data di oggi entra nell'hash: "_start" di una riga dipende da quando la si legge
+        righe = cache.extract(_livetv_blocks(html),
+                              lambda block: [_livetv_event(row, clock)
+                                             for row in _livetv_rows(f"<table>{block}</table>")],
+                              salt=clock.today,
+                              full=lambda: [_livetv_event(row, clock) for row in _livetv_rows(html)])
+
+    risultati = []
+    visti = set()
+    for ev in righe:
+        if ev["url"] in visti:
+            continue
+        visti.add(ev["url"])
+        risultati.append(ev)
+    return risultati
+
+
+def _livetv_rows(html: str):
+    doc = _lxml_doc(html) if HTML_PARSER == "lxml" else None
+    return _livetv_rows_lxml(doc) if doc is not None else _livetv_rows_bs4(html)
+
+
+def _livetv_event(row, clock: _LondonClock) -> dict:
+    titolo, descrizione, url, time_raw = row
+    if "_" in url:
+        url = url.split("_")[0]
+
+    orario = ""
+    start = None
+    if "(" in time_raw and ")" in time_raw:
+        parts = time_raw.split("(", 1)
+        before_paren = parts[0].strip()
+        m = _HHMM.search(before_paren)
+        orario = m.group(0) if m else before_paren
+        if m:
+            # es. "18 October at 16:30": la data della riga vale anche dopo mezzanotte
+            giorno = clock.resolve_date(before_paren)
+            start = clock.to_utc(giorno, int(m.group(1)), int(m.group(2)))
+
+    return {
+        "title": titolo,
+        "competition": descrizione,
+        "time": orario,
+        "url": url,
+        "_start": start,
+    }
+
+
+def _livetv_rows_bs4(html: str):
+    soup = make_soup(html)
+    for a in soup.select('a.live'):
+        row = a.find_parent('tr')
+        if not row:
+            continue
+
+        left_td = row.select_one('td[width="34"]')
+        descrizione = ""
+        if left_td:
+            img = left_td.find('img', alt=True)
+            if img:
+                descrizione = img['alt'].strip()
+
+        time_tag = row.find('span', class_='evdesc')
+        time_raw = time_tag.get_text(" ", strip=True) if time_tag else ""
+        yield a.get_text(strip=True), descrizione, a.get('href', ''), time_raw
+
+
+def _livetv_rows_lxml(doc):
+    for a in doc.iter('a'):
+        if not _lxml_has_class(a, 'live'):
+            continue
+        row = _lxml_parent(a, 'tr')
+        if row is None:
+            continue
+
+        descrizione = ""
+        left_td = next((td for td in row.iter('td') if td.get('width') == "34"), None)
+        if left_td is not None:
+            img = next((i for i in left_td.iter('img') if i.get('alt') is not None), None)
+            if img is not None:
+                descrizione = img.get('alt').strip()
+
+        time_tag = next((sp for sp in row.iter('span') if _lxml_has_class(sp, 'evdesc')), None)
+        time_raw = _lxml_text(time_tag, " ") if time_tag is not None else ""
+        yield _lxml_text(a), descrizione, a.get('href', ''), time_raw
+
+
+def parse_livetv_event(html: str) -> list[dict]:
+    """Link acestream della pagina evento LiveTV con lingua, bitrate e qualità."""
+    doc = _lxml_doc(html) if HTML_PARSER == "lxml" else None
+    links = _livetv_links_lxml(doc) if doc is not None else _livetv_links_bs4(html)
+
+    acestream_links = []
+    for href, img_title, img_src, bitrate in links:
+        language = None
+        if img_title is not None or img_src is not None:
+            language = resolve_lang_code(img_title, img_src)
+        acestream_links.append({
+            "link": href,
+            "language": language,
+            "bitrate": bitrate,
+            "quality": bitrate_to_quality(bitrate)
+        })
+    return acestream_links
+
+
+def _livetv_links_bs4(html: str):
+    soup_partita = make_soup(html)
+    for link in soup_partita.find_all('a', href=lambda href: href and 'acestream://' in href):
+        tr = link.find_parent('tr')
+        img_title, img_src, bitrate = None, None, None
+        if tr:
+            td = tr.find('td')
+            img = td.find('img') if td else None
+            if img:
+                img_title, img_src = img.get('title'), img.get('src')
+            bitrate_td = tr.find('td', class_='bitrate')
+            bitrate = bitrate_td.get_text(strip=True) if bitrate_td else None
+        yield link['href'], img_title, img_src, bitrate
+
+
+def _livetv_links_lxml(doc):
+    for link in doc.iter('a'):
+        href = link.get('href')
+        if not href or 'acestream://' not in href:
+            continue
+        tr = _lxml_parent(link, 'tr')
+        img_title, img_src, bitrate = None, None, None
+        if tr is not None:
+            td = next(tr.iter('td'), None)
+            img = next(td.iter('img'), None) if td is not None else None
+            if img is not None:
+                img_title, img_src = img.get('title'), img.get('src')
+            bitrate_td = next((c for c in tr.iter('td') if _lxml_has_class(c, 'bitrate')), None)
+            bitrate = _lxml_text(bitrate_td) if bitrate_td is not None else None
+        yield href, img_title, img_src, bitrate
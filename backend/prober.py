@@ -0,0 +1,148 @@
+# backend/prober.py
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+from cache import TTLCache
+from engine import UpstreamError
+from merge import content_id
+
+# API HTTP di un engine AceStream (es. http://127.0.0.1:6878); vuoto = prober spento
+ACESTREAM_ENGINE_URL = os.getenv("ACESTREAM_ENGINE_URL", "")
+# sonde contemporanee verso l'engine
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", "4"))
+# validità dell'esito per content ID (s); i link morti si ricontrollano prima
+PROBE_TTL = float(os.getenv("PROBE_TTL", "300"))
+PROBE_DEAD_TTL = float(os.getenv("PROBE_DEAD_TTL", "120"))
+# attesa massima (s) dei primi peer per una sonda
+PROBE_WAIT = float(os.getenv("PROBE_WAIT", "4.0"))
+PROBE_POLL = 0.5
+
+
+@dataclass
+class LinkHealth:
+    alive: bool
+    peers: int
+    checked_at: float
+
+
+class LinkProber:
+    """
+    Verifica in background i content ID dei risultati con l'engine AceStream
+    (getstream → stat fino ai primi peer → stop) e ne tiene in cache vivo/morto
+    e peer. `rank` ordina i link per disponibilità usando solo la cache.
+    Va usato dal loop dell'engine (schedule/probe).
+    """
+
+    def __init__(self, get, engine_url: str = ACESTREAM_ENGINE_URL,
+                 concurrency: int = PROBE_CONCURRENCY, ttl: float = PROBE_TTL,
+                 dead_ttl: float = PROBE_DEAD_TTL, wait: float = PROBE_WAIT):
+        self._get = get
+        self.engine_url = engine_url.rstrip("/")
+        self.ttl = ttl
+        self.dead_ttl = dead_ttl
+        self.wait = wait
+        self.cache = TTLCache(maxsize=4096, ttl=ttl)
+        self._concurrency = concurrency
+        self._slots: asyncio.Semaphore | None = None
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.engine_url)
+
+    def health(self, cid: str) -> LinkHealth | None:
+        return self.cache.get(cid)
+
+    # ---------- sonde ----------
+
+    def schedule(self, cids):
+        """Avvia le sonde mancanti (non in cache né in corso); non attende."""
+        if not self.enabled:
+            return
+        for cid in dict.fromkeys(cids):
+            if cid in self._inflight or self.cache.get(cid) is not None:
+                continue
+            task = asyncio.ensure_future(self.probe(cid))
+            self._inflight[cid] = task
+            task.add_done_callback(lambda t, cid=cid: self._inflight.pop(cid, None))
+
+    async def probe(self, cid: str) -> LinkHealth | None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._concurrency)
+        async with self._slots:
+            try:
+                health = await self._probe(cid)
+            except (UpstreamError, ValueError, TypeError) as e:
+                # engine irraggiungibile o risposta strana: esito sconosciuto, niente cache
+                logging.warning(f"[PROBE] {cid}: {e}")
+                return None
+        self.cache.set(cid, health, ttl=self.ttl if health.alive else self.dead_ttl)
+        return health
+
+    async def _api(self, url: str) -> dict:
+        response = await self._get(url, timeout=self.wait)
+        response.raise_for_status()
+        data = json.loads(response.text)
+        if not isinstance(data, dict):
+            raise ValueError(f"risposta inattesa dall'engine: {type(data).__name__}")
+        return data
+
+    @staticmethod
+    def _payload(reply: dict) -> dict:
+        payload = reply.get("response") or {}
+        if not isinstance(payload, dict):
+            raise ValueError("campo response inatteso dall'engine")
+        return payload
+
+    async def _probe(self, cid: str) -> LinkHealth:
+        start = await self._api(f"{self.engine_url}/ace/getstream?id={cid}&format=json")
+        if start.get("error") or not start.get("response"):
+            return LinkHealth(alive=False, peers=0, checked_at=time.time())
+        payload = self._payload(start)
+        stat_url, command_url = payload.get("stat_url"), payload.get("command_url")
+        if not stat_url:
+            raise ValueError("risposta di getstream senza stat_url")
+        peers = 0
+        try:
+            deadline = time.monotonic() + self.wait
+            while time.monotonic() < deadline:
+                stat = await self._api(stat_url)
+                info = self._payload(stat)
+                if stat.get("error"):
+                    break
+                peers = int(info.get("peers") or 0)
+                if peers > 0 or info.get("status") == "dl":
+                    break
+                await asyncio.sleep(PROBE_POLL)
+        finally:
+            if command_url:
+                try:
+                    await self._get(f"{command_url}?method=stop", timeout=self.wait)
+                except UpstreamError:
+                    pass
+        return LinkHealth(alive=peers > 0, peers=peers, checked_at=time.time())
+
+    # ---------- ranking ----------
+
+    def rank(self, links: list[dict]) -> list[dict]:
+        """
+        Copia dei link con `available`/`peers` dalla cache, ordinata: vivi per
+        peer decrescenti → non ancora verificati → morti. A parità resta l'ordine di pagina.
+        """
+        if not self.enabled:
+            return links
+        ranked = []
+        for link in links:
+            cid = content_id(link.get("link"))
+            health = self.cache.get(cid) if cid else None
+            if health is None:
+                ranked.append(((1, 0), {**link, "available": None}))
+            else:
+                key = (0, -health.peers) if health.alive else (2, 0)
+                ranked.append((key, {**link, "available": health.alive, "peers": health.peers}))
+        ranked.sort(key=lambda x: x[0])
+        return [link for _, link in ranked]
@@ -0,0 +1,96 @@
+# backend/providers.py
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable
+
+import metrics
+
+# tempo massimo (s) di default per sorgente in /acestream
+SOURCE_TIMEOUT = float(os.getenv("SOURCE_TIMEOUT", "5.0"))
+
+
+class SourceError(Exception):
+    """Sorgente non disponibile: finisce nell'envelope come `error`."""
+
+
+# search: termine -> {"events": [...], "partial": bool opzionale}, solleva SourceError se giù
+Search = Callable[[str], Awaitable[dict]]
+# loader dello snapshot: () -> (eventi, meta), vedi snapshot.SnapshotStore
+Loader = Callable[[], tuple]
+# identità di un evento fra due refresh dello snapshot, vedi snapshot.diff_events
+Key = Callable[[dict], Hashable]
+
+
+@dataclass
+class Provider:
+    name: str
+    search: Search
+    loader: Loader | None = None
+    timeout: float = SOURCE_TIMEOUT
+    key: Key | None = None
+
+
+def envelope(source: str, search_term: str, events: list | None = None,
+             error: str | None = None, partial: bool = False) -> dict:
+    """Forma unica del risultato di una sorgente, anche in caso di errore o timeout."""
+    return {"source": source, "search_term": search_term, "events": events or [],
+            "error": error, "partial": partial}
+
+
+class ProviderRegistry:
+    """
+    Sorgenti di eventi registrate per nome. `search` le interroga tutte in
+    parallelo, ognuna col proprio budget: la latenza è quella della più lenta,
+    non la somma.
+    """
+
+    def __init__(self):
+        self._providers: dict[str, Provider] = {}
+
+    def register(self, name: str, search: Search, loader: Loader | None = None,
+                 timeout: float | None = None, key: Key | None = None) -> Provider:
+        provider = Provider(name, search, loader, SOURCE_TIMEOUT if timeout is None else timeout, key)
+        self._providers[name] = provider
+        return provider
+
+    def __iter__(self):
+        return iter(self._providers.values())
+
+    def __len__(self):
+        return len(self._providers)
+
+    def get(self, name: str) -> Provider | None:
+        return self._providers.get(name)
+
+    def names(self) -> list[str]:
+        return list(self._providers)
+
+    def max_timeout(self) -> float:
+        return max((p.timeout for p in self), default=0.0)
+
+    async def search(self, search_term: str, on_result: Callable[[dict], None] | None = None) -> list[dict]:
+        """
+        Un envelope per sorgente, nell'ordine di registrazione. `on_result`
+        riceve ogni envelope appena la sua sorgente finisce (per lo streaming).
+        """
+        async def run(provider: Provider) -> dict:
+            res = await self._run(provider, search_term)
+            if on_result is not None:
+                on_result(res)
+            return res
+
+        return list(await asyncio.gather(*(run(p) for p in self)))
+
+    async def _run(self, provider: Provider, search_term: str) -> dict:
+        try:
+            with metrics.observe(provider.name, "search"):
+                res = await asyncio.wait_for(provider.search(search_term), provider.timeout)
+        except asyncio.TimeoutError:
+            metrics.TIMEOUTS.labels(provider.name, "source").inc()
+            return envelope(provider.name, search_term, error="timeout")
+        except Exception as e:
+            logging.error(f"Errore {provider.name}: {e}")
+            return envelope(provider.name, search_term, error=str(e) or type(e).__name__)
+        return envelope(provider.name, search_term, res.get("events"), partial=bool(res.get("partial")))
@@ -0,0 +1,314 @@
+# backend/search.py
+import os
+import re
+from dataclasses import dataclass
+
+import unicodedata
+from rapidfuzz import fuzz
+
+try:  # scoring vettoriale (rapidfuzz.process.cdist richiede numpy)
+    import numpy as np
+    from rapidfuzz.process import cdist
+except ImportError:  # pragma: no cover
+    np = None
+
+from alias import AliasEngine
+from word import SYNONYMS, STOPWORDS
+
+# thread per lo scoring batch (-1 = tutti i core)
+RANKING_WORKERS = int(os.getenv("RANKING_WORKERS", "1"))
+# bonus massimo di _score: serve a scartare i candidati prima del gate
+_SUBSTRING_BONUS = 6
+
+
+def normalize_string(s):
+    return unicodedata.normalize('NFKD', s).encode('ASCII', 'ignore').decode('utf-8')
+
+
+def _norm_simple(s: str) -> str:
+    return re.sub(r"\s+", " ", normalize_string((s or "").lower())).strip()
+
+
+ALIASES = AliasEngine(SYNONYMS, STOPWORDS, normalize=_norm_simple)
+
+
+def _apply_syn(s: str) -> str:
+    return ALIASES.rewrite(s)
+
+
+def _clean(s: str) -> str:
+    return _apply_syn(_norm_simple(s))
+
+
+def _tokens(s: str) -> list[str]:
+    return ALIASES.tokens(s)
+
+
+def _gate_tokens(s_clean: str) -> frozenset[str]:
+    """Token (≥3 char) usati dal gate."""
+    return frozenset(tok for tok in _tokens(s_clean) if len(tok) >= 3)
+
+
+def _gate_ok(q_clean: str, t_clean: str,
+             q_tokens: frozenset[str] | None = None,
+             t_tokens: frozenset[str] | None = None) -> bool:
+    """Accetta solo se c'è overlap serio: almeno un token ≥3 char in comune
+    OPPURE substring di un token query (≥4 char) nel titolo
+    OPPURE partial_ratio alto.
+    I token possono arrivare già calcolati dall'indice."""
+    if q_tokens is None:
+        q_tokens = _gate_tokens(q_clean)
+    if t_tokens is None:
+        t_tokens = _gate_tokens(t_clean)
+    if q_tokens & t_tokens:
+        return True
+    if any(tok in t_clean for tok in q_tokens if len(tok) >= 4):
+        return True
+    if fuzz.partial_ratio(q_clean, t_clean) >= 80:
+        return True
+    return False
+
+
+def _score(q_clean: str, t_clean: str) -> float:
+    """Score semplice e robusto ai typo/riordini."""
+    s1 = fuzz.token_set_ratio(q_clean, t_clean)  # robusto a ordine/parole extra
+    s2 = fuzz.partial_ratio(q_clean, t_clean)  # robusto a sottostringhe/typo
+    # bonus se la query (pulita) è substring del titolo
+    bonus = _SUBSTRING_BONUS if q_clean in t_clean and len(q_clean) >= 4 else 0
+    return float(max(s1, s2) + bonus)
+
+
+@dataclass(slots=True)
+class IndexedEvent:
+    event: dict
+    title: str
+    title_tokens: frozenset[str]
+    competition: str
+    competition_tokens: frozenset[str]
+    title_grams: frozenset[str] = frozenset()
+    competition_grams: frozenset[str] = frozenset()
+
+
+def _bigrams(s: str) -> list[str]:
+    return [s[i:i + 2] for i in range(len(s) - 1)]
+
+
+class CandidateIndex:
+    """
+    Indice invertito (token del gate e bigrammi di caratteri) su una colonna di
+    testi puliti: restituisce un sovrainsieme esatto dei testi che possono
+    passare _gate_ok, così il fuzzy scoring tocca solo quelli.
+
+    - token in comune: posting dei token;
+    - token query ≥4 char contenuto nel testo: il testo ha tutti i suoi bigrammi;
+    - partial_ratio ≥ 80: con m = min(len(q), len(t)) l'allineamento ha
+      LCS ≥ 2m/3 in al più LCS/2 + 1 blocchi contigui, quindi almeno m/3 - 1
+      posizioni della query hanno un bigramma presente nel testo.
+    """
+
+    def __init__(self, texts: list[str], tokens: list[frozenset[str]],
+                 text_grams: list[frozenset[str]] | None = None):
+        self.size = len(texts)
+        self.lengths = np.fromiter((len(t) for t in texts), dtype=np.float64, count=len(texts))
+        if text_grams is None:
+            text_grams = [frozenset(_bigrams(t)) for t in texts]
+        grams: dict[str, list[int]] = {}
+        toks: dict[str, list[int]] = {}
+        for i, (text_gram, text_tokens) in enumerate(zip(text_grams, tokens)):
+            for g in text_gram:
+                grams.setdefault(g, []).append(i)
+            for tok in text_tokens:
+                toks.setdefault(tok, []).append(i)
+        self._grams = {g: np.array(v, dtype=np.int32) for g, v in grams.items()}
+        self._tokens = {t: np.array(v, dtype=np.int32) for t, v in toks.items()}
+        self._empty = np.zeros(0, dtype=np.int32)
+
+    def _count(self, grams) -> "np.ndarray":
+        postings = [self._grams.get(g, self._empty) for g in grams]
+        return np.bincount(np.concatenate(postings) if postings else self._empty, minlength=self.size)
+
+    def candidates(self, q_clean: str, q_tokens: frozenset[str]) -> "np.ndarray":
+        """Posizioni (crescenti) dei testi che possono passare il gate."""
+        need = np.minimum(len(q_clean), self.lengths) / 3 - 1
+        mask = self._count(_bigrams(q_clean)) >= need
+        for tok in q_tokens:
+            hits = self._tokens.get(tok)
+            if hits is not None:
+                mask[hits] = True
+            if len(tok) >= 4:
+                grams = set(_bigrams(tok))
+                mask |= self._count(grams) == len(grams)
+        return np.flatnonzero(mask)
+
+
+class EventIndex:
+    """
+    Titoli e competizioni già normalizzati (_norm_simple + _apply_syn) con i
+    token del gate, costruito una volta per lista eventi: le query fanno solo scoring.
+    Con `previous` (l'indice dello snapshot precedente) gli eventi rimasti uguali,
+    cioè gli stessi dict restituiti dalla BlockCache, riusano la loro voce.
+    """
+
+    def __init__(self, events: list[dict], previous: "EventIndex | None" = None):
+        self.events = events
+        self.entries: list[IndexedEvent] = []
+        # colonne per lo scoring batch; le competizioni vuote sono escluse
+        self.titles: list[str] = []
+        self.title_tokens: list[frozenset[str]] = []
+        self.competitions: list[str] = []
+        self.competition_tokens: list[frozenset[str]] = []
+        self.competition_idx: list[int] = []
+        reuse = {id(e.event): e for e in previous.entries} if previous is not None else {}
+        for ev in events:
+            # previous tiene vivi i suoi eventi: l'id non può essere stato riciclato
+            entry = reuse.get(id(ev)) or self._entry(ev)
+            self.entries.append(entry)
+            self.titles.append(entry.title)
+            self.title_tokens.append(entry.title_tokens)
+            if entry.competition:
+                self.competitions.append(entry.competition)
+                self.competition_tokens.append(entry.competition_tokens)
+                self.competition_idx.append(len(self.entries) - 1)
+        if np is not None:
+            self.title_candidates, self.competition_candidates = self._candidate_indexes()
+
+    @staticmethod
+    def _entry(ev: dict) -> IndexedEvent:
+        title = _clean(ev.get("title") or ev.get("titolo") or "")
+        comp_raw = ev.get("competition") or ev.get("descrizione") or ""
+        # competizione vuota → esclusa dal pass 2
+        comp = _clean(comp_raw) if comp_raw.strip() else ""
+        return IndexedEvent(
+            event=ev,
+            title=title,
+            title_tokens=_gate_tokens(title),
+            competition=comp,
+            competition_tokens=_gate_tokens(comp),
+            title_grams=frozenset(_bigrams(title)),
+            competition_grams=frozenset(_bigrams(comp)),
+        )
+
+    def _candidate_indexes(self):
+        """Indici dei candidati per titoli e competizioni (sovrascrivibile, vedi fts.py)."""
+        return (CandidateIndex(self.titles, self.title_tokens, [e.title_grams for e in self.entries]),
+                CandidateIndex(self.competitions, self.competition_tokens,
+                               [self.entries[i].competition_grams for i in self.competition_idx]))
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def search_events_pipeline(parsed_events: "EventIndex | list[dict]",
+                           search_term: str,
+                           top_n: int = 3,
+                           strong_threshold_title: float = 90.0,
+                           min_score_desc: float = 72.0) -> list[dict]:
+    """
+    1) Titolo: se esiste uno strong match (>= strong_threshold_title) → ritorna SOLO quello.
+    2) Descrizione/Competition: se no, ritorna fino a top_n risultati sopra min_score_desc.
+    Accetta una lista di eventi o un EventIndex già costruito.
+    """
+    if not search_term:
+        return []
+
+    index = parsed_events if isinstance(parsed_events, EventIndex) else EventIndex(parsed_events)
+    q_clean = _clean(search_term)
+    q_tokens = _gate_tokens(q_clean)
+
+    if np is not None:
+        return _pipeline_batch(index, q_clean, q_tokens, top_n, strong_threshold_title, min_score_desc)
+
+    # ---------- PASS 1: TITOLO (strong -> 1 solo risultato) ----------
+    strong_hits = []
+    for idx, entry in enumerate(index.entries):
+        if not _gate_ok(q_clean, entry.title, q_tokens, entry.title_tokens):
+            continue
+        s = _score(q_clean, entry.title)
+        if s >= strong_threshold_title:
+            strong_hits.append((idx, s))
+
+    if strong_hits:
+        best_idx, best_s = max(strong_hits, key=lambda x: x[1])
+        ev = index.entries[best_idx].event
+        return [{**ev, "_score": round(best_s, 2), "_match": "strong_title"}]
+
+    # ---------- PASS 2: DESCRIZIONE / COMPETITION (multi risultati) ----------
+    scored_desc = []
+    for idx, entry in enumerate(index.entries):
+        if not entry.competition:
+            continue
+        if not _gate_ok(q_clean, entry.competition, q_tokens, entry.competition_tokens):
+            continue
+        s = _score(q_clean, entry.competition)
+        if s >= min_score_desc:
+            scored_desc.append((idx, s))
+
+    scored_desc.sort(key=lambda x: x[1], reverse=True)
+    out = []
+    for idx, s in scored_desc[:top_n]:
+        ev = index.entries[idx].event
+        out.append({**ev, "_score": round(s, 2), "_match": "desc"})
+    return out
+
+
+def _batch_scores(q_clean: str, choices: list[str], threshold: float):
+    """
+    max(token_set_ratio, partial_ratio) di tutte le scelte in due chiamate cdist.
+    I cutoff scartano solo valori che non possono né passare il gate (pr ≥ 80)
+    né arrivare alla soglia col bonus; sopra il cutoff i punteggi sono esatti.
+    Ritorna (best, partial_ratio).
+    """
+    floor = max(0.0, threshold - _SUBSTRING_BONUS)
+    pr = cdist([q_clean], choices, scorer=fuzz.partial_ratio, score_cutoff=min(80.0, floor),
+               dtype=np.float64, workers=RANKING_WORKERS)[0]
+    ts = cdist([q_clean], choices, scorer=fuzz.token_set_ratio, score_cutoff=floor,
+               dtype=np.float64, workers=RANKING_WORKERS)[0]
+    return np.maximum(pr, ts), pr
+
+
+def _batch_hits(q_clean: str, q_tokens: frozenset[str], choices: list[str],
+                tokens: list[frozenset[str]], threshold: float,
+                candidates: CandidateIndex) -> list[tuple[int, float]]:
+    """(posizione, score) sopra soglia e col gate ok, come _gate_ok + _score in loop."""
+    positions = candidates.candidates(q_clean, q_tokens)
+    if not positions.size:
+        return []
+    if positions.size < len(choices):
+        positions = positions.tolist()
+        subset = [choices[p] for p in positions]
+    else:
+        positions, subset = None, choices
+    best, pr = _batch_scores(q_clean, subset, threshold)
+    bonus_ok = len(q_clean) >= 4
+    hits = []
+    # gate e bonus solo per chi può arrivare alla soglia
+    for i in np.flatnonzero(best + _SUBSTRING_BONUS >= threshold).tolist():
+        pos = i if positions is None else positions[i]
+        text = choices[pos]
+        if not (q_tokens & tokens[pos]
+                or any(tok in text for tok in q_tokens if len(tok) >= 4)
+                or pr[i] >= 80):
+            continue
+        s = float(best[i] + (_SUBSTRING_BONUS if bonus_ok and q_clean in text else 0))
+        if s >= threshold:
+            hits.append((pos, s))
+    return hits
+
+
+def _pipeline_batch(index: EventIndex, q_clean: str, q_tokens: frozenset[str], top_n: int,
+                    strong_threshold_title: float, min_score_desc: float) -> list[dict]:
+    """Stesse due passate di search_events_pipeline con lo scoring batch."""
+    entries = index.entries
+    strong_hits = _batch_hits(q_clean, q_tokens, index.titles, index.title_tokens,
+                              strong_threshold_title, index.title_candidates)
+    if strong_hits:
+        best_idx, best_s = max(strong_hits, key=lambda x: x[1])
+        ev = entries[best_idx].event
+        return [{**ev, "_score": round(best_s, 2), "_match": "strong_title"}]
+
+    scored_desc = [(index.competition_idx[pos], s) for pos, s in _batch_hits(
+        q_clean, q_tokens, index.competitions, index.competition_tokens,
+        min_score_desc, index.competition_candidates)]
+    scored_desc.sort(key=lambda x: x[1], reverse=True)
+    return [{**entries[idx].event, "_score": round(s, 2), "_match": "desc"}
+            for idx, s in scored_desc[:top_n]]
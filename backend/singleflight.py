@@ -0,0 +1,33 @@
+# backend/singleflight.py
+import asyncio
+from typing import Awaitable, Callable
+
+
+class SingleFlight:
+    """
+    Coalescing delle chiamate concorrenti con la stessa chiave: la prima avvia
+    il lavoro, le altre attendono lo stesso risultato. Da usare solo dal loop
+    dell'engine (nessun lock necessario).
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(fn())
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda f: self._forget(key, f))
+        # shield: se un chiamante va in timeout il lavoro continua per gli altri
+        return await asyncio.shield(fut)
+
+    def _forget(self, key: str, fut: asyncio.Future):
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+
+    def inflight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def __len__(self):
+        return len(self._inflight)
@@ -0,0 +1,212 @@
+# backend/snapshot.py
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable
+
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "60"))
+# attesa massima (s) di una ricerca quando la sorgente non ha ancora uno snapshot
+SNAPSHOT_WAIT_SECONDS = float(os.getenv("SNAPSHOT_WAIT_SECONDS", "3"))
+
+
+@dataclass
+class Snapshot:
+    """Palinsesto già parsato di una sorgente, condiviso da tutte le ricerche."""
+    source: str
+    events: list[dict]
+    meta: dict = field(default_factory=dict)
+    fetched_at: float = field(default_factory=time.time)
+    # struttura di ricerca costruita una volta per snapshot (es. search.EventIndex)
+    index: Any = None
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+@dataclass
+class Delta:
+    """Eventi aggiunti, cambiati (vecchio, nuovo) e spariti fra due snapshot di una sorgente."""
+    added: list[dict] = field(default_factory=list)
+    updated: list[tuple[dict, dict]] = field(default_factory=list)
+    removed: list[dict] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.added or self.updated or self.removed)
+
+    def __str__(self):
+        return f"+{len(self.added)} ~{len(self.updated)} -{len(self.removed)}"
+
+
+# identità di un evento fra un refresh e l'altro (es. l'url della pagina evento)
+Key = Callable[[dict], Hashable]
+
+
+def diff_events(old: list[dict], new: list[dict], key: Key) -> Delta:
+    """
+    Confronto per chiave. Gli eventi riusati dalla BlockCache sono gli stessi
+    dict e si scartano per identità: il confronto campo per campo tocca solo il resto.
+    """
+    delta = Delta()
+    previous = {key(ev): ev for ev in old}
+    seen = set()
+    for ev in new:
+        k = key(ev)
+        if k in seen:
+            continue
+        seen.add(k)
+        before = previous.get(k)
+        if before is None:
+            delta.added.append(ev)
+        elif before is not ev and before != ev:
+            delta.updated.append((before, ev))
+    delta.removed = [ev for k, ev in previous.items() if k not in seen]
+    return delta
+
+
+# loader: () -> (events, meta). Deve sollevare un'eccezione se la sorgente non risponde.
+Loader = Callable[[], tuple[list[dict], dict]]
+# persistenza opzionale: save(snapshot) dopo ogni refresh riuscito,
+# restore(source) -> (events, meta, fetched_at) | None all'avvio
+Save = Callable[[Snapshot], None]
+Restore = Callable[[str], tuple[list[dict], dict, float] | None]
+# listener: (source, delta, snapshot) dopo ogni refresh che cambia qualcosa
+Listener = Callable[[str, Delta, Snapshot], None]
+
+
+class SnapshotStore:
+    """
+    Tiene in memoria l'ultimo palinsesto valido per ogni sorgente e lo aggiorna
+    in background ogni `interval` secondi. Le chiamate upstream dipendono solo
+    dall'intervallo, non dal numero di ricerche.
+
+    Per le sorgenti registrate con una `key` ogni refresh calcola il Delta
+    rispetto allo snapshot precedente e lo passa ai listener (invalidazioni
+    mirate delle cache); l'indexer riceve l'indice precedente da riusare.
+    """
+
+    def __init__(self, interval: float = SNAPSHOT_REFRESH_SECONDS,
+                 indexer: Callable[..., Any] | None = None,
+                 save: Save | None = None, restore: Restore | None = None):
+        self.interval = interval
+        self.indexer = indexer
+        self._save = save
+        self._restore = restore
+        self._loaders: dict[str, Loader] = {}
+        self._intervals: dict[str, float] = {}
+        self._keys: dict[str, Key] = {}
+        self._listeners: list[Listener] = []
+        self._snapshots: dict[str, Snapshot] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._ready: dict[str, threading.Event] = {}
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def register(self, source: str, loader: Loader, interval: float | None = None, key: Key | None = None):
+        self._loaders[source] = loader
+        self._intervals[source] = interval or self.interval
+        self._locks[source] = threading.Lock()
+        self._ready[source] = threading.Event()
+        if key is not None:
+            self._keys[source] = key
+
+    def subscribe(self, listener: Listener):
+        self._listeners.append(listener)
+
+    def peek(self, source: str) -> Snapshot | None:
+        """Ultimo snapshot valido, senza attendere."""
+        return self._snapshots.get(source)
+
+    def get(self, source: str, timeout: float = SNAPSHOT_WAIT_SECONDS) -> Snapshot | None:
+        """
+        Ultimo snapshot valido; se non c'è ancora attende al più `timeout` secondi
+        il thread di refresh, l'unico che chiama la sorgente. None se non arriva.
+        """
+        snap = self._snapshots.get(source)
+        if snap is not None:
+            return snap
+        self._ready[source].wait(timeout)
+        return self._snapshots.get(source)
+
+    def refresh(self, source: str) -> Snapshot | None:
+        lock = self._locks[source]
+        with lock:
+            start_time = time.time()
+            try:
+                events, meta = self._loaders[source]()
+            except Exception as e:
+                # teniamo l'ultimo snapshot buono
+                logging.error(f"[SNAPSHOT] Aggiornamento {source} fallito: {e}")
+                return self._snapshots.get(source)
+            old = self._snapshots.get(source)
+            delta = None
+            if old is not None and source in self._keys:
+                delta = diff_events(old.events, events, self._keys[source])
+            if not self.indexer:
+                index = events
+            elif old is not None and old.index is not None:
+                index = self.indexer(events, previous=old.index)
+            else:
+                index = self.indexer(events)
+            snap = Snapshot(source=source, events=events, meta=meta, index=index)
+            self._snapshots[source] = snap
+            self._ready[source].set()
+            logging.info(f"[SNAPSHOT] {source}: {len(events)} eventi in {time.time() - start_time:.2f}s"
+                         + (f" ({delta})" if delta is not None else ""))
+        if delta:
+            for listener in self._listeners:
+                try:
+                    listener(source, delta, snap)
+                except Exception as e:
+                    logging.error(f"[SNAPSHOT] Listener {source} fallito: {e}")
+        if self._save is not None:
+            try:
+                self._save(snap)
+            except Exception as e:
+                logging.error(f"[SNAPSHOT] Salvataggio {source} fallito: {e}")
+        return snap
+
+    def warm_start(self):
+        """
+        Carica gli ultimi snapshot salvati: le ricerche li usano subito mentre
+        il thread di refresh li aggiorna (la loro età supera già l'intervallo).
+        """
+        if self._restore is None:
+            return
+        for source in self._loaders:
+            try:
+                saved = self._restore(source)
+            except Exception as e:
+                logging.error(f"[SNAPSHOT] Lettura {source} salvato fallita: {e}")
+                continue
+            if saved is None:
+                continue
+            events, meta, fetched_at = saved
+            index = self.indexer(events) if self.indexer else events
+            with self._locks[source]:
+                if source not in self._snapshots:
+                    self._snapshots[source] = Snapshot(source=source, events=events, meta=meta,
+                                                       fetched_at=fetched_at, index=index)
+                    self._ready[source].set()
+            logging.info(f"[SNAPSHOT] {source}: {len(events)} eventi dal disco "
+                         f"(vecchi di {time.time() - fetched_at:.0f}s)")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.warm_start()
+        self._thread = threading.Thread(target=self._run, name="snapshot-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for source in list(self._loaders):
+                snap = self._snapshots.get(source)
+                if snap is None or snap.age >= self._intervals[source]:
+                    self.refresh(source)
+            self._stop.wait(1.0)
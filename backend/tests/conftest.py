@@ -0,0 +1,6 @@
+# backend/tests/conftest.py
+import sys
+from pathlib import Path
+
+# i moduli del backend si importano piatti (come in main.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,17 @@
+# backend/tests/test_breaker.py
+from breaker import ADAPTIVE_MIN_SAMPLES, RetryPolicy
+
+
+def test_timeout_uses_latencies_of_the_same_request_kind():
+    policy = RetryPolicy()
+    for _ in range(200):
+        policy.record_success("livetv868.me", 0.02, "/")
+        policy.record_success("livetv868.me", 0.02, "/enx/eventinfo (304)")
+    for _ in range(ADAPTIVE_MIN_SAMPLES):
+        policy.record_success("livetv868.me", 0.9, "/enx/allupcoming")
+
+    # il listing non eredita il p95 delle probe e delle rivalidazioni
+    assert policy.timeout("livetv868.me", 0, fallback=0.5, kind="/enx/allupcoming") >= 1.8
+    assert policy.timeout("livetv868.me", 0, fallback=0.5, kind="/") < 0.5
+    # tipo senza campioni: vale il fallback
+    assert policy.timeout("livetv868.me", 0, fallback=0.5, kind="/enx/eventinfo") == 0.5
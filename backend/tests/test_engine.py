@@ -0,0 +1,31 @@
+# backend/tests/test_engine.py
+import pytest
+
+from bench.stub_server import start_stub_server
+from cache import TTLCache
+from engine import AsyncEngine
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server, base_url = start_stub_server()
+    yield base_url
+    server.shutdown()
+
+
+def test_etag_revalidation_against_stub(stub):
+    engine = AsyncEngine(host_limits={})
+    url = f"{stub}/livetv868/enx/eventinfo/100001/"
+
+    first = engine.run(engine.get(url, timeout=5))
+    assert first.status_code == 200
+    # gli header restano case-insensitive qualunque sia la grafia del server
+    assert first.headers.get("ETag")
+    assert first.headers.get("etag") == first.headers.get("ETag")
+
+    cache = TTLCache(ttl=0.0)
+    cache.set(url, "links", etag=first.headers.get("ETag"))
+    entry = cache.peek(url)
+    assert not entry.fresh
+    again = engine.run(engine.get(url, timeout=5, headers=entry.conditional_headers()))
+    assert again.status_code == 304
@@ -0,0 +1,53 @@
+# backend/tests/test_merge.py
+from datetime import datetime, timedelta, timezone
+
+from merge import merge_results
+
+T0 = datetime(2026, 10, 18, 20, 0, tzinfo=timezone.utc)
+CHANNEL_247 = "a"  # canale 24/7: stesso CID per partite diverse
+
+
+def ev(title, start, *cids):
+    """Evento con un link per CID; un CID è una cifra hex ripetuta 40 volte."""
+    return {"title": title, "competition": "", "_start": start,
+            "acestream_links": [{"link": f"acestream://{c * 40}"} for c in cids]}
+
+
+def env(source, *events):
+    return {"source": source, "search_term": "x", "events": list(events), "error": None, "partial": False}
+
+
+def titles(merged):
+    return [(e["title"], e["sources"]) for e in merged[0]["events"]]
+
+
+def test_shared_cid_outside_time_window_is_not_merged():
+    merged = merge_results([
+        env("LiveTV", ev("Arsenal – Chelsea", T0, CHANNEL_247)),
+        env("PlatinSport", ev("Liverpool v Everton", T0 + timedelta(hours=3), CHANNEL_247, "b")),
+    ], "x")
+    assert titles(merged) == [("Arsenal – Chelsea", ["LiveTV"]), ("Liverpool v Everton", ["PlatinSport"])]
+
+
+def test_group_never_holds_two_events_of_the_same_source():
+    late = T0 + timedelta(minutes=15)
+    merged = merge_results([
+        env("LiveTV", ev("Arsenal – Chelsea", T0, "c"), ev("Liverpool – Everton", late, "d")),
+        # stesso CID dell'una e titolo dell'altra: la catena non deve unire i due eventi LiveTV
+        env("PlatinSport", ev("Liverpool v Everton", late, "c")),
+    ], "x")
+    events = merged[0]["events"]
+    assert all(e["sources"].count("LiveTV") <= 1 for e in events)
+    assert sorted(e["title"] for e in events if "LiveTV" in e["sources"]) == \
+        ["Arsenal – Chelsea", "Liverpool – Everton"]
+    assert len(events) == 2
+
+
+def test_same_match_from_two_sources_is_merged():
+    merged = merge_results([
+        env("LiveTV", ev("Arsenal – Chelsea", T0, "c")),
+        env("PlatinSport", ev("Arsenal v Chelsea", T0 + timedelta(minutes=5), "c", "e")),
+    ], "x")
+    (event,) = merged[0]["events"]
+    assert event["sources"] == ["LiveTV", "PlatinSport"]
+    assert len(event["acestream_links"]) == 2
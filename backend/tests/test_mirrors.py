@@ -0,0 +1,43 @@
+# backend/tests/test_mirrors.py
+import asyncio
+
+import pytest
+
+from engine import Response, UpstreamError, UpstreamStatusError
+from mirrors import MirrorManager
+
+
+def make_manager(status_for):
+    calls = []
+
+    async def fetch(url):
+        calls.append(url)
+        status = status_for(url)
+        if status is None:
+            raise UpstreamError(f"ClientConnectorError per {url}")
+        response = Response(url=url, status_code=status, text="")
+        response.raise_for_status()
+        return response
+
+    return MirrorManager(fetch, base_url="https://livetv", suffix=".me", start=868), calls
+
+
+def test_client_error_reaches_caller_without_switching_mirror():
+    mirrors, calls = make_manager(lambda url: 404 if "eventinfo" in url else 200)
+    with pytest.raises(UpstreamStatusError) as err:
+        asyncio.run(mirrors.fetch("/enx/eventinfo/1_gone/"))
+    assert err.value.status_code == 404
+    assert calls == ["https://livetv868.me/enx/eventinfo/1_gone/"]
+    assert mirrors.health[868].ok is True
+
+    number, _ = asyncio.run(mirrors.fetch("/enx/allupcoming/"))
+    assert number == 868 and len(calls) == 2
+
+
+@pytest.mark.parametrize("status", [503, None])
+def test_server_and_network_errors_race_other_mirrors(status):
+    mirrors, _ = make_manager(lambda url: status if "livetv868" in url else 200)
+    number, _ = asyncio.run(mirrors.fetch("/enx/allupcoming/"))
+    assert number != 868
+    assert mirrors.health[868].ok is False
+    assert mirrors.current == number
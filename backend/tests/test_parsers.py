@@ -0,0 +1,92 @@
+# backend/tests/test_parsers.py
+from datetime import date, datetime, timezone
+
+import pytest
+
+from bench.stub_server import load_fixture
+from parsers import BlockCache, _LondonClock, parse_livetv_listing, parse_platin_events
+
+FOOTER = ('<div class="footer"><p>Footer</p><time datetime="2026-10-18T21:00:00Z">21:00</time>'
+          'Footer vs Match <a href="acestream://' + "f" * 40 + '">CHANNEL 9 HD</a></div>')
+NESTED = '<div class="ad">sponsor</div>'
+NESTED_P = '<div class="ad"><p>sponsor</p></div>'
+NESTED_TR = '</a><table><tr><td>x</td></tr></table><br><span class="evdesc">'
+
+
+def between_events(html: str, markup: str, n: int = 3) -> str:
+    """`markup` dopo i primi `n` eventi (prima del <time> successivo)."""
+    parts = html.split("<time")
+    for i in range(1, min(n + 1, len(parts) - 1)):
+        parts[i] += markup
+    return "<time".join(parts)
+
+
+def platin_pages():
+    daily = load_fixture("platinsport_daily.html")
+    return {
+        "fixture": daily,
+        "footer": daily.replace("</body>", FOOTER + "</body>"),
+        "nested_div": daily.replace("<p>", NESTED + "<p>", 2),
+        "nested_p": between_events(daily, NESTED_P),
+        "unclosed": daily.replace("</div></body>", "</body>"),
+    }
+
+
+def livetv_pages():
+    html = load_fixture("livetv_allupcoming.html")
+    return {
+        "fixture": html,
+        "nested_tr": html.replace('</a><br><span class="evdesc">', NESTED_TR),
+    }
+
+
+@pytest.mark.parametrize("name", list(platin_pages()))
+def test_platin_cached_parse_matches_full_parse(name):
+    html = platin_pages()[name]
+    # senza verifica: si controlla lo split, non il ripiego sul parse completo
+    cache = BlockCache(verify_every=0)
+    full = parse_platin_events(html)
+    assert parse_platin_events(html, cache=cache) == full
+    # secondo giro tutto dalla cache
+    assert parse_platin_events(html, cache=cache) == full
+    assert cache.parsed == 0
+    assert not any(ev["title"] == "Footer vs Match" for ev in full)
+    assert not any(ev["competition"] == "sponsor" for ev in full)
+
+
+@pytest.mark.parametrize("name", list(livetv_pages()))
+def test_livetv_cached_parse_matches_full_parse(name):
+    html = livetv_pages()[name]
+    changed = html.replace("</a>", " (R)</a>", 5)
+    cache = BlockCache(verify_every=0)
+    full = parse_livetv_listing(html)
+    assert all(ev["_start"] is not None for ev in full)
+    assert parse_livetv_listing(html, cache=cache) == full
+    assert parse_livetv_listing(changed, cache=cache) == parse_livetv_listing(changed)
+    assert 0 < cache.parsed <= 5
+
+
+def test_block_cache_falls_back_to_full_parse_on_mismatch():
+    # un <p> dentro un commento: lo split lo prende per un confine di sezione
+    html = between_events(load_fixture("platinsport_daily.html"), "<!-- <p>vecchio</p> -->", n=1)
+    full = parse_platin_events(html)
+    assert parse_platin_events(html, cache=BlockCache(verify_every=0)) != full
+
+    cache = BlockCache()
+    assert parse_platin_events(html, cache=cache) == full
+    assert not cache.enabled
+    assert parse_platin_events(html, cache=cache) == full
+
+
+@pytest.mark.parametrize("giorno, hhmm, expected", [
+    # fine dell'ora legale 2026: 25 ottobre, 02:00 BST → 01:00 GMT
+    (date(2026, 10, 25), (0, 30), datetime(2026, 10, 24, 23, 30, tzinfo=timezone.utc)),
+    (date(2026, 10, 25), (12, 0), datetime(2026, 10, 25, 12, 0, tzinfo=timezone.utc)),
+    # inizio dell'ora legale 2026: 29 marzo, 01:00 GMT → 02:00 BST
+    (date(2026, 3, 29), (0, 30), datetime(2026, 3, 29, 0, 30, tzinfo=timezone.utc)),
+    (date(2026, 3, 29), (20, 0), datetime(2026, 3, 29, 19, 0, tzinfo=timezone.utc)),
+    (date(2026, 10, 18), (20, 0), datetime(2026, 10, 18, 19, 0, tzinfo=timezone.utc)),
+])
+def test_london_clock_on_clock_change_days(giorno, hhmm, expected):
+    clock = _LondonClock(datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc))
+    assert clock.to_utc(giorno, *hhmm) == expected
@@ -0,0 +1,41 @@
+# backend/tests/test_prober.py
+import asyncio
+import json
+
+import pytest
+
+from engine import Response
+from prober import LinkProber
+
+CID = "a" * 40
+
+
+def prober_for(*replies):
+    """Prober con un engine finto che risponde `replies` in ordine."""
+    pending = list(replies)
+
+    async def get(url, timeout):
+        body = pending.pop(0) if pending else {"response": {}}
+        return Response(url=url, status_code=200, text=json.dumps(body))
+
+    return LinkProber(get, engine_url="http://engine", wait=0.2)
+
+
+@pytest.mark.parametrize("replies", [
+    (["not", "a", "dict"],),
+    ({"response": {"command_url": "http://engine/cmd"}},),  # senza stat_url
+    ({"response": "busy"},),
+    ({"response": {"stat_url": "http://engine/stat"}}, {"response": [1, 2]}),
+    ({"response": {"stat_url": "http://engine/stat"}}, {"response": {"peers": {"n": 3}}}),
+])
+def test_malformed_engine_replies_are_unknown(replies):
+    prober = prober_for(*replies)
+    assert asyncio.run(prober.probe(CID)) is None
+    assert prober.health(CID) is None
+
+
+def test_probe_reads_peers():
+    prober = prober_for({"response": {"stat_url": "http://engine/stat"}},
+                        {"response": {"peers": 7, "status": "dl"}})
+    health = asyncio.run(prober.probe(CID))
+    assert health.alive and health.peers == 7
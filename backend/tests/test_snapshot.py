@@ -0,0 +1,47 @@
+# backend/tests/test_snapshot.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from snapshot import SnapshotStore
+
+
+def test_searches_never_call_the_loader_while_upstream_is_down():
+    calls = []
+
+    def loader():
+        calls.append(time.time())
+        time.sleep(0.05)
+        raise ConnectionError("upstream giù")
+
+    store = SnapshotStore(interval=60)
+    store.register("LiveTV", loader)
+    store.start()
+    try:
+        start = time.monotonic()
+        with ThreadPoolExecutor(32) as pool:
+            snaps = list(pool.map(lambda _: store.get("LiveTV", timeout=0.3), range(64)))
+        assert snaps == [None] * 64
+        assert time.monotonic() - start < 1.0
+        # solo il thread di refresh chiama la sorgente (≈ una volta al secondo)
+        assert len(calls) <= 2
+    finally:
+        store.stop()
+
+
+def test_get_waits_for_the_first_load():
+    release = threading.Event()
+
+    def loader():
+        release.wait(1)
+        return [{"title": "Arsenal – Chelsea"}], {}
+
+    store = SnapshotStore(interval=60)
+    store.register("LiveTV", loader)
+    store.start()
+    try:
+        threading.Timer(0.1, release.set).start()
+        snap = store.get("LiveTV", timeout=2)
+        assert snap is not None and snap.events[0]["title"] == "Arsenal – Chelsea"
+    finally:
+        store.stop()
@@ -425,14 +425,33 @@ export default function App() {
         }
 
         try {
-            const response = await fetch(`${API_BASE}/acestream?term=${encodeURIComponent(searchTerm)}`, {
+            // NDJSON: una riga per sorgente, mostrata appena arriva
+            const response = await fetch(`${API_BASE}/acestream/stream?term=${encodeURIComponent(searchTerm)}`, {
                 headers: { 'Time-Zone': Intl.DateTimeFormat().resolvedOptions().timeZone },
                 signal: controller.signal,
                 cache: "no-store"
             });
-            const data = await response.json();
-            if (thisReqId !== requestIdRef.current) return;
-            setResults(data);
+            if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            const data = [];
+            let buffer = "";
+            for (;;) {
+                const {value, done} = await reader.read();
+                buffer += decoder.decode(value || new Uint8Array(), {stream: !done});
+                const lines = buffer.split("\n");
+                buffer = done ? "" : lines.pop();
+                lines.filter(line => line.trim()).forEach(line => data.push(JSON.parse(line)));
+                if (thisReqId !== requestIdRef.current) {
+                    reader.cancel();
+                    return;
+                }
+                // niente "Nessun link trovato" finché può ancora arrivare un'altra sorgente
+                if (done || data.some(source => Array.isArray(source.events) && source.events.length > 0)) {
+                    setResults([...data]);
+                }
+                if (done) break;
+            }
             setSearched(true);
             setBarPosition(0);
             setMobileMoving(false);